@@ -0,0 +1,39 @@
+import argparse
+import json
+
+parser = argparse.ArgumentParser(description="Compare two result files of run_benchmarks.py.")
+parser.add_argument("old", help="Result file of the reference version.", type=str)
+parser.add_argument("new", help="Result file of the version to check.", type=str)
+parser.add_argument("--threshold",
+                    default=1.2, help="Time ratio (new / old) from which a stage is reported as a regression.",
+                    type=float)
+
+
+def main(args):
+    with open(args.old) as reader:
+        old = json.load(reader)
+    with open(args.new) as reader:
+        new = json.load(reader)
+
+    print(f"{'tree':<24}{'stage':<18}{'old s':>10}{'new s':>10}{'ratio':>8}{'old MB':>10}{'new MB':>10}")
+    regressions = 0
+    for tree, result in new["trees"].items():
+        if tree not in old["trees"]:
+            continue
+        for stage, values in result["stages"].items():
+            before = old["trees"][tree]["stages"].get(stage)
+            if before is None:
+                continue
+            ratio = values["seconds"] / max(before["seconds"], 1e-9)
+            marker = " !" if ratio >= args.threshold else ""
+            regressions += bool(marker)
+            memory = "".join(f"{x['peak_mb']:>10.1f}" if "peak_mb" in x else f"{'-':>10}" for x in (before, values))
+            print(f"{tree:<24}{stage:<18}{before['seconds']:>10.3f}{values['seconds']:>10.3f}{ratio:>8.2f}{memory}"
+                  f"{marker}")
+    print(f"{regressions} stages are at least {args.threshold} times slower.")
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    args = parser.parse_args([] if "__file__" not in globals() else None)
+    raise SystemExit(main(args))
@@ -0,0 +1,157 @@
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+repo_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, repo_dir)
+
+import draw_graphviz_tree  # noqa: E402
+import draw_tikz_tree  # noqa: E402
+import treecont.layout  # noqa: E402
+from trees import shapes, write_tree  # noqa: E402
+from treecont.cache import load_tree  # noqa: E402
+from treecont.newick import read_tree  # noqa: E402
+from treecont.session import TreeSession  # noqa: E402
+
+parser = argparse.ArgumentParser(description="Time every stage of both drawing scripts on synthetic trees.")
+parser.add_argument("--shapes",
+                    default=",".join(shapes), help="Tree shapes divided by commas.",
+                    type=str)
+parser.add_argument("--sizes",
+                    default="1000,10000,100000,1000000", help="Numbers of leaves divided by commas.",
+                    type=str)
+parser.add_argument("--dfs_depth",
+                    default=8, help="Depth of the dfs contraction used by all renders.",
+                    type=int)
+parser.add_argument("--repeat",
+                    default=3, help="Number of timed runs of every stage, the fastest one is reported.",
+                    type=int)
+parser.add_argument("--no_memory",
+                    default=False,
+                    dest='no_memory', help="Skip the extra run of every stage measuring its peak memory.",
+                    action='store_true')
+parser.add_argument("--data_dir",
+                    default=os.path.join(repo_dir, "benchmarks", "data"), help="Directory for the generated trees, "
+                                                                                "they are reused by later runs.",
+                    type=str)
+parser.add_argument("--results",
+                    default=None, help="Path to the json result file, benchmarks/results/<git commit>.json if not "
+                                       "given. Compare two of them with compare_benchmarks.py.",
+                    type=str)
+
+
+def measure(stage, repeat, memory):
+    """Fastest wall time of repeat runs of stage, and its peak of traced memory in a separate run."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        stage()
+        times.append(time.perf_counter() - start)
+
+    result = {"seconds": min(times)}
+    if memory:  # tracing slows python code down, so it does not run together with the timing
+        tracemalloc.start()
+        stage()
+        result["peak_mb"] = tracemalloc.get_traced_memory()[1] / 2 ** 20
+        tracemalloc.stop()
+    return result
+
+
+def script_args(script, **options):
+    args = script.parser.parse_args([])
+    for key, value in options.items():
+        setattr(args, key, value)
+    return args
+
+
+def benchmark_tree(path, args, work_dir):
+    cache_dir = os.path.join(work_dir, "cache")
+
+    def load_cold():
+        shutil.rmtree(cache_dir, ignore_errors=True)
+        load_tree(path, cache_dir=cache_dir)
+
+    session = TreeSession(read_tree(path))
+    tree = session.tree
+
+    def contraction():
+        # the visible nodes are computed lazily, on the first view
+        TreeSession(tree).contraction([], args.dfs_depth).visible
+
+    def layout():
+        treecont.layout.layout(tree, *session.view(session.contraction([], args.dfs_depth)))
+        treecont.layout.layout(tree, *session.view(session.entire_tree))
+
+    common = {"tree_file": path, "do_contraction": True, "dfs_depth": args.dfs_depth}
+    dot_args = script_args(draw_graphviz_tree, dot_name=os.path.join(work_dir, "tree.dot"), **common)
+    index_args = script_args(draw_graphviz_tree, dot_name=os.path.join(work_dir, "index.dot"), html_index=True,
+                             **common)
+    # the tikz script expects a list of nodes to contract, even an empty one
+    tikz_args = script_args(draw_tikz_tree, tex_name=os.path.join(work_dir, "tree.tex"), to_contract="", **common)
+    svg_args = script_args(draw_tikz_tree, tex_name=os.path.join(work_dir, "tree.tex"), to_contract="",
+                           backend="svg", **common)
+
+    # contraction and layouts stay in the session, so the emission stages measure the output only
+    stages = [
+        ("parse", lambda: read_tree(path)),
+        ("load_tree_cold", load_cold),
+        ("load_tree_warm", lambda: load_tree(path, cache_dir=cache_dir)),
+        ("contraction", contraction),
+        ("layout", layout),
+        ("dot_html_files", lambda: draw_graphviz_tree.main(dot_args, session)),
+        ("dot_html_index", lambda: draw_graphviz_tree.main(index_args, session)),
+        ("tikz", lambda: draw_tikz_tree.main(tikz_args, session)),
+        ("svg", lambda: draw_tikz_tree.main(svg_args, session)),
+    ]
+
+    contracted = session.contraction([], args.dfs_depth)
+    result = {"nodes": len(tree), "leaves": int(tree.is_leaf.sum()), "max_depth": int(tree.depth.max()),
+              "visible_nodes": len(session.view(contracted)[0]), "stages": {}}
+    for name, stage in stages:
+        result["stages"][name] = measure(stage, args.repeat, not args.no_memory)
+        print(f"  {name}: {result['stages'][name]['seconds']:.3f} s", flush=True)
+    return result
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=repo_dir, stdout=subprocess.PIPE,
+                              stderr=subprocess.DEVNULL, check=True).stdout.decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(args):
+    os.makedirs(args.data_dir, exist_ok=True)
+    commit = git_commit()
+    report = {"commit": commit, "date": time.strftime("%Y-%m-%d %H:%M:%S"), "python": platform.python_version(),
+              "numpy": np.__version__, "machine": platform.machine(), "dfs_depth": args.dfs_depth, "trees": {}}
+
+    for shape in args.shapes.split(","):
+        for leaves in [int(x) for x in args.sizes.split(",")]:
+            path = os.path.join(args.data_dir, f"{shape}_{leaves}.nwk")
+            if not os.path.exists(path):  # the seed is fixed, so a generated tree never changes
+                write_tree(shape, leaves, path)
+            print(f"{shape} {leaves} leaves", flush=True)
+            with tempfile.TemporaryDirectory() as work_dir:
+                report["trees"][f"{shape}_{leaves}"] = benchmark_tree(path, args, work_dir)
+
+    results = args.results or os.path.join(repo_dir, "benchmarks", "results", f"{commit or 'unknown'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(results)), exist_ok=True)
+    with open(results, mode='w') as writer:
+        json.dump(report, writer, indent=1)
+    print(f"Results written to {results}.")
+
+
+if __name__ == '__main__':
+    args = parser.parse_args([] if "__file__" not in globals() else None)
+    main(args)
@@ -0,0 +1,89 @@
+import numpy as np
+
+shapes = ("balanced", "caterpillar", "yule", "star")
+star_group = 100  # leaves under every node below the root of a star tree
+
+
+def balanced(leaves, rng):
+    # heap order, the children of i are 2i+1 and 2i+2
+    return np.arange(-1, 2 * leaves - 2) // 2
+
+
+def caterpillar(leaves, rng):
+    # spine nodes are even, every spine node has a leaf and the next spine node below it
+    parent = np.empty(2 * leaves - 1, dtype=np.int64)
+    parent[0] = -1
+    spine = np.arange(0, 2 * leaves - 2, 2)
+    parent[spine + 1] = spine
+    parent[spine + 2] = spine
+    return parent
+
+
+def yule(leaves, rng):
+    # every step splits a leaf chosen uniformly at random into two
+    parent = [-1]
+    current = [0]
+    for _ in range(leaves - 1):
+        i = rng.integers(len(current))
+        node = current[i]
+        first, second = len(parent), len(parent) + 1
+        parent += [node, node]
+        current[i] = first
+        current.append(second)
+    return np.array(parent)
+
+
+def star(leaves, rng):
+    groups = -(-leaves // star_group)
+    parent = [-1] + [0] * groups
+    for group in range(groups):
+        size = min(star_group, leaves - group * star_group)
+        parent += [group + 1] * size
+    return np.array(parent)
+
+
+generators = {"balanced": balanced, "caterpillar": caterpillar, "yule": yule, "star": star}
+
+
+def newick_lines(parent, rng):
+    """Newick text of the tree given by parent (any node order), with random branch lengths and supports."""
+    n = len(parent)
+    order = np.argsort(parent, kind="stable")
+    child_count = np.bincount(parent[parent >= 0], minlength=n)
+    child_offsets = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(child_count, out=child_offsets[1:])
+    children = order[1:]  # the root is the only -1 and sorts first
+    lengths = rng.random(n).round(4).tolist()
+    supports = rng.random(n).round(2).tolist()
+    child_offsets, children = child_offsets.tolist(), children.tolist()
+
+    root = order[0]
+    stack = [(root, 0)]
+    while stack:
+        node, i = stack.pop()
+        start, end = child_offsets[node], child_offsets[node + 1]
+        if start == end:  # leaf
+            yield f"L{node}:{lengths[node]}"
+        elif i == 0:
+            yield "("
+        if start + i < end:
+            if i > 0:
+                yield ","
+            stack.append((node, i + 1))
+            stack.append((children[start + i], 0))
+        elif start != end:
+            yield f"){supports[node]}" + ("" if node == root else f":{lengths[node]}")
+    yield ";\n"
+
+
+def write_tree(shape, leaves, path, seed=0):
+    rng = np.random.default_rng(seed)
+    parent = generators[shape](leaves, rng)
+    with open(path, mode='w') as writer:
+        batch = []
+        for part in newick_lines(parent, rng):
+            batch.append(part)
+            if len(batch) >= 1 << 16:
+                writer.write("".join(batch))
+                batch.clear()
+        writer.write("".join(batch))
@@ -0,0 +1,63 @@
+import argparse
+import os
+import re
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+from treecont.tikz import prune_pages
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--tex_name",
+                    default="testing_dot.tex", help="Path to the tex file written by draw_tikz_tree.py with "
+                                                    "--split_pages.",
+                    type=str)
+parser.add_argument("--workers",
+                    default=os.cpu_count(), help="Number of pages compiled at the same time.",
+                    type=int)
+parser.add_argument("--latex",
+                    default="pdflatex", help="LaTeX program producing pdf files.",
+                    type=str)
+
+include_pattern = re.compile(r"\\includepdf\[[^\]]*\]\{([^}]*)\.pdf\}")
+
+
+def compile_document(latex, tex_path):
+    directory, name = os.path.split(os.path.abspath(tex_path))
+    jobname = os.path.splitext(name)[0]
+    result = subprocess.run([latex, "-interaction=nonstopmode", "-halt-on-error", name], cwd=directory,
+                            stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+    if result.returncode != 0:
+        pdf_path = os.path.join(directory, f"{jobname}.pdf")
+        if os.path.exists(pdf_path):  # never keep a broken pdf, it would be taken as up to date
+            os.remove(pdf_path)
+        raise RuntimeError(f"{latex} failed on {tex_path}, see {os.path.join(directory, jobname)}.log")
+
+
+def main(args):
+    with open(args.tex_name) as reader:
+        pages = include_pattern.findall(reader.read())
+
+    # pages are named by the hash of their contents, so a page with a pdf is up to date
+    base_dir = os.path.dirname(os.path.abspath(args.tex_name))
+    page_dirs = {}
+    for page in pages:
+        directory, name = os.path.split(os.path.join(base_dir, page))
+        page_dirs.setdefault(directory, set()).add(name)
+    for directory, names in page_dirs.items():  # pages of earlier renders, not included any more
+        prune_pages(directory, names)
+
+    outdated = [os.path.join(base_dir, f"{page}.tex") for page in pages
+                if not os.path.exists(os.path.join(base_dir, f"{page}.pdf"))]
+    outdated = list(dict.fromkeys(outdated))
+    print(f"Compiling {len(outdated)} of {len(pages)} subtree pages.")
+
+    with ThreadPoolExecutor(max(1, args.workers)) as pool:
+        for _ in pool.map(lambda path: compile_document(args.latex, path), outdated):
+            pass
+
+    compile_document(args.latex, args.tex_name)
+
+
+if __name__ == '__main__':
+    args = parser.parse_args([] if "__file__" not in globals() else None)
+    main(args)
@@ -1,8 +1,9 @@
 import argparse
-import math
-import networkx as nx
-from Bio import Phylo as ph
-import os
+
+from treecont.api import prepare, render
+from treecont.batch import batch_main
+from treecont.defaults import default_cache_dir, default_cache_size, low_conf
+from treecont.profiling import Profiler
 
 parser = argparse.ArgumentParser()
 parser.add_argument("--tree_file",
@@ -12,7 +13,8 @@ parser.add_argument("--entry_width",
                     default=15, help="Width od the single graphviz node",
                     type=int)
 parser.add_argument("--dot_name",
-                    default="testing_dot.dot", help="Path to the output dot file.",
+                    default="testing_dot.dot", help="Path to the output dot file, compressed with gzip if the name "
+                                                    "ends with .gz.",
                     type=str)
 parser.add_argument("--to_contract",
                     default=None, help="Labels of nodes to contract divided by commas (no spaces). You can get "
@@ -30,6 +32,39 @@ parser.add_argument("--dfs_depth",
                     help="Maximal depth of the tree. If not specified, dfs contraction is not performed. Must be used "
                          "with the <do_contraction> switch."
                     )
+parser.add_argument("--max_visible_nodes",
+                    default=None,
+                    type=int,
+                    help="Contract the tree automatically so that at most this many nodes are drawn, the largest "
+                         "subtrees are expanded first. Replaces the dfs contraction, nodes from <to_contract> stay "
+                         "contracted. The chosen nodes are printed. Must be used with the <do_contraction> switch."
+                    )
+parser.add_argument("--max_root_distance",
+                    default=None,
+                    type=float,
+                    help="Contract every clade farther from the root than this sum of branch lengths. Replaces the dfs "
+                         "contraction, nodes from <to_contract> stay contracted. Must be used with the "
+                         "<do_contraction> switch."
+                    )
+parser.add_argument("--collapse_support",
+                    default=None, nargs="?", const=low_conf,
+                    type=float,
+                    help=f"Merge every inner node with a lower confidence into its parent, so its children form a "
+                         f"polytomy ({low_conf} without a value). Nodes are numbered after the merge."
+                    )
+parser.add_argument("--contract_by_name",
+                    default=None,
+                    type=str,
+                    help="Regular expression, contract the smallest subtree holding all leaves with a matching name. "
+                         "Must be used with the <do_contraction> switch."
+                    )
+parser.add_argument("--contract_by_taxon",
+                    default=None, nargs="?", const="",
+                    type=str,
+                    help="Taxa divided by commas (name suffixes, e.g. DAUCS,HELAN), contract every largest subtree "
+                         "whose leaves all belong to one of them. Without a value, all taxa are contracted. Must be "
+                         "used with the <do_contraction> switch."
+                    )
 parser.add_argument("--helper_labels",
                     default=False,
                     dest='helper_labels', help="Print unique node identifiers. "
@@ -41,201 +76,74 @@ parser.add_argument("--entry_height",
 parser.add_argument("--fontsize",
                     default=50, help="Fontsize of graphviz node label.",
                     type=int)
+parser.add_argument("--positions",
+                    default=False,
+                    dest='positions', help="Compute the tree layout in the script and write explicit positions of "
+                                           "all nodes and edges. Render the output with <neato -n2> instead of dot, "
+                                           "Graphviz then only draws the picture.",
+                    action='store_true')
+parser.add_argument("--html_index",
+                    default=False,
+                    dest='html_index', help="Write the sequence lists of all contracted nodes into one data file "
+                                            "with a single html viewer instead of one html file per node.",
+                    action='store_true')
+parser.add_argument("--batch",
+                    default=None, help="Json or yaml file with a list of configurations, each one maps options to "
+                                       "their values, e.g. [{\"dfs_depth\": 6, \"dot_name\": \"d6.dot\"}]. The tree "
+                                       "is loaded once and every configuration is rendered, the other options are "
+                                       "the defaults.",
+                    type=str)
+parser.add_argument("--batch_workers",
+                    default=1, help="Number of processes rendering the configurations of <batch>.",
+                    type=int)
+parser.add_argument("--profile",
+                    default=None, help="Path to a json report with the time, number of runs and peak memory of "
+                                       "every stage and statistics of the tree.",
+                    type=str)
+parser.add_argument("--profile_stats",
+                    default=None, help="Path for the cProfile statistics of the slowest stage, readable with pstats "
+                                       "or snakeviz. Must be used with <profile>.",
+                    type=str)
+parser.add_argument("--annotations",
+                    default=None, help="CSV file with a header and the columns name, category and optionally color "
+                                       "(#rrggbb only), nodes are colored by the categories of their leaves.",
+                    type=str)
+parser.add_argument("--color_mode",
+                    default="majority", choices=["majority", "proportional"],
+                    help="Color of a node with annotated leaves, the majority category or a stripe per category "
+                         "as wide as its share.",
+                    type=str)
+parser.add_argument("--cache_dir",
+                    default=default_cache_dir, help="Directory for the binary cache of parsed trees.",
+                    type=str)
+parser.add_argument("--cache_size",
+                    default=default_cache_size, help="Maximal size of the tree cache directory in MB.",
+                    type=int)
+parser.add_argument("--no_cache",
+                    default=False,
+                    dest='no_cache', help="Always parse the tree file, do not read or write the tree cache.",
+                    action='store_true')
 
 
-def load_tree(tree_file):
-    tree = ph.read(tree_file, 'newick')
-    graph = ph.to_networkx(tree)
-    node_info = {}
-
-    clade_nodes = {}
-
-    new_graph = nx.DiGraph()
-
-    for i, node in enumerate(graph.nodes):
-        clade_nodes[node] = i
-        name = node.name
-        node_info[f"{i}"] = {
-            "clade_info": node,
-            "name": name,
-            "contracted_sequences": None,
-            "color": ["grey"]  # can be adjusted through an external dictionary
-        }
-
-    for a, b in graph.edges:
-        current = ["", ""]
-        for i, node in enumerate([a, b]):
-            current[i] = f"{clade_nodes[node]}"
-
-        for item in current:
-            new_graph.add_node(item)
-        new_graph.add_edge(*current)
-
-    return new_graph, node_info
-
-
-def main(args):
-    def node_contraction(contract_node):
-        if new_graph.out_degree(contract_node) == 0:
-            return
-
-        subtree = nx.dfs_tree(new_graph, contract_node)
-        following_nodes = subtree.nodes()
-
-        # contract info on the node
-        clade_infos, names, color = [], [], []
-        for x in following_nodes:
-            if info_on_node[x]["contracted_sequences"]:  # is contracted
-                clade_infos.extend(info_on_node[x]["clade_info"])
-                names.extend(info_on_node[x]["name"])
-
-                # color choosing -- this is fairly stupid and unusable
-                color.extend(info_on_node[x]["color"])
-
-            else:  # is not contracted
-                clade_infos.append(info_on_node[x]["clade_info"])
-                names.append(info_on_node[x]["name"])
-                color = info_on_node[x]["color"]
-
-        # manipulate_graph, save contracted info
-        new_graph.remove_nodes_from([x for x in following_nodes if x != contract_node])
-        info_on_node[contract_node] = {
-            "clade_info": clade_infos,
-            "contracted_sequences": True,
-            "name": names,
-            "color": color
-        }
-
-    def build_subtree_label(node, node_info):
-        subtree_size = len([x for x in node_info["name"] if x is not None])  # no of sequences in subtree
-
-        if args.helper_labels:
-            label = f"v={node}\n{subtree_size} seqs"
-        else:
-            label = f"{subtree_size} seqs"
-
-        return label
-
-    def make_html_file(node, node_info):
-        dirname = args.dot_name[:-4]
-        filename = f"{dirname}/subtree_{node}.html"
-        os.makedirs(dirname, exist_ok=True)
-
-        with open(filename, mode='w') as writer:
-            print("<!DOCTYPE HTML>\n<html>", file=writer)
-            print("<body>", file=writer)
-            print("<table>", file=writer)
-            # header
-            print("<tr>", file=writer)
-            print("<th>Sequence identificator</th>\n", file=writer)
-            print("</tr>", file=writer)
-            # elements
-
-            for name in node_info["name"]:
-                if name is None:
-                    continue
-
-                colors = node_info["color"]
-                if len(colors) == 0:
-                    print(f"<tr style=\"background-color: {select_color(colors)}\">", file=writer)
-                else:
-                    print(f"<tr>", file=writer)
-                print(f"<td>{name}</td>\n",
-                      file=writer)
-                print("</tr>", file=writer)
-            print("</table>", file=writer)
-            print("<br>", file=writer)
-
-            print("</body>", file=writer)
-            print("</html>", file=writer)
-
-        return filename
-
-    def select_color(color_options):
-        return color_options.pop()
-
-    def build_leaf_label(node, node_info, row=30):
-        name = node_info["name"]
-        t = '\n'.join([name[x * row:x * row + row] for x in range(math.ceil(len(name) / row))])
-        return t
-
-    def do_contraction(to_contract, dfs_depth):
-        # contract specified nodes
-        if to_contract is not None:
-            for contract_node in to_contract:
-                node_contraction(contract_node)
-
-        if dfs_depth is not None:
-            shallow_tree = nx.dfs_tree(new_graph, '0', dfs_depth)
-            dfs_to_contract = ([n for n, deg in shallow_tree.out_degree() if deg == 0])
-            for contract_node in dfs_to_contract:
-                node_contraction(contract_node)
-
-    new_graph, info_on_node = load_tree(args.tree_file)
-
-    if args.do_contraction:
-        if args.to_contract is not None:
-            node_ids_to_contract = args.to_contract.split(',')
-        else:
-            node_ids_to_contract = args.to_contract
-        do_contraction(node_ids_to_contract, args.dfs_depth)
-
-    with open(args.dot_name, mode='w') as treewr:
-        print("graph {", file=treewr)
-        # print("rankdir=\"LR\"", file=treewr)
-        print("splines=\"false\"", file=treewr)
-        print("overlap=\"false\"", file=treewr)
-        print(f"ranksep=\"{args.entry_width // 2}\"", file=treewr)
-        print("nodesep=\"2\"", file=treewr)
-        print(f"fontsize=\"{args.fontsize}\"", file=treewr)
-
-        for vertex in new_graph.nodes:
-            node_info = info_on_node[vertex]
-            if node_info["contracted_sequences"] is not None:
-                label = build_subtree_label(vertex, node_info)
-                htmlfile = make_html_file(vertex, node_info)
+def main(args, session=None):
+    profiler = Profiler(enabled=args.profile is not None, cprofile=args.profile_stats is not None)
+    session, contraction, categories = prepare(args, profiler, session)
 
-                if len(node_info["color"]) == 0:
-                    color = args.neutral_color
-                elif len(node_info["color"]) == 1:
-                    color = node_info["color"].pop()
-                else:
-                    color = select_color(node_info["color"])
-                print(
-                    f"{vertex} [shape=\"triangle\", color=\"black\", width={args.entry_width}, style=\"filled\", "
-                    f"fillcolor=\"{color}\", label=\"{label}\", fontsize={args.fontsize}, URL=\"{htmlfile}\"]",
-                    file=treewr)
-            else:
-                represented_clade = node_info["clade_info"]
-                if represented_clade.name is None:
-                    if represented_clade.confidence is None:
-                        print(f"{vertex} [shape=\"point\", color=\"black\"]",
-                              file=treewr)
-                    else:
-                        conf = "{:.2f}".format(represented_clade.confidence)
-                        if args.helper_labels:
-                            print(
-                                f"{vertex} [shape=\"box\", width=1, color=\"black\", label=\"v={vertex}\", "
-                                f"fontsize={args.fontsize}]",
-                                file=treewr)
-                        else:
-                            print(f"{vertex} [shape=\"point\", color=\"black\"]",
-                                  file=treewr)
-                else:
-                    label = build_leaf_label(vertex, node_info)
-                    color = select_color(node_info["color"])
-                    print(
-                        f"{vertex} [shape=\"box\", color=\"black\", width={args.entry_width}, style=\"filled\", "
-                        f"fillcolor=\"{color}\", label=\"{label}\", fontsize={args.fontsize}]",
-                        file=treewr)
+    if args.positions:
+        with profiler.stage("layout"):
+            session.ranks(contraction)
 
-        for u, v in new_graph.edges:
-            # print(f"{u} -- {v} [headport=w, tailport=e];", file=treewr)
-            print(f"{u} -- {v} [headport=n, tailport=s];", file=treewr)
+    render(session, contraction, args.dot_name, format="dot", entry_width=args.entry_width, fontsize=args.fontsize,
+           helper_labels=args.helper_labels, positions=args.positions, html_index=args.html_index,
+           categories=categories, color_mode=args.color_mode, profiler=profiler)
 
-        print("}", file=treewr)
+    if args.profile is not None:
+        profiler.write_report(args.profile, "draw_graphviz_tree", args.profile_stats)
 
 
 if __name__ == '__main__':
     args = parser.parse_args([] if "__file__" not in globals() else None)
-    main(args)
+    if args.batch is None:
+        main(args)
+    else:
+        batch_main(args, main)
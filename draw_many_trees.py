@@ -0,0 +1,188 @@
+import argparse
+import glob
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import draw_graphviz_tree
+import draw_tikz_tree
+from treecont.cache import default_cache_dir, default_cache_size, load_tree
+from treecont.newick import parse_trees
+from treecont.session import TreeSession
+
+parser = argparse.ArgumentParser(description="Render many trees with the same options. Options not listed here are "
+                                             "passed to the drawing script, e.g. --do_contraction --dfs_depth 6.")
+parser.add_argument("--input",
+                    default=".", help="Directory with one tree per file, a glob pattern (quote it) or a newick file "
+                                      "with any number of trees.",
+                    type=str)
+parser.add_argument("--output_dir",
+                    default="rendered", help="Directory for the outputs and the manifest.",
+                    type=str)
+parser.add_argument("--format",
+                    default="dot", choices=["dot", "tikz"],
+                    help="Drawing script, draw_graphviz_tree.py or draw_tikz_tree.py (with its --backend).",
+                    type=str)
+parser.add_argument("--tree_workers",
+                    default=os.cpu_count(), help="Number of processes rendering the trees. --workers goes to the "
+                                                 "tikz script, for the subtree pages of every tree.",
+                    type=int)
+parser.add_argument("--manifest",
+                    default=None, help="Path to the json manifest listing every tree with its outputs, node counts, "
+                                       "time and error. <output_dir>/manifest.json if not given.",
+                    type=str)
+parser.add_argument("--cache_dir",
+                    default=default_cache_dir, help="Directory for the binary cache of parsed trees.",
+                    type=str)
+parser.add_argument("--cache_size",
+                    default=default_cache_size, help="Maximal size of the tree cache directory in MB.",
+                    type=int)
+parser.add_argument("--no_cache",
+                    default=False,
+                    dest='no_cache', help="Always parse the tree files, do not read or write the tree cache.",
+                    action='store_true')
+
+scripts = {"dot": draw_graphviz_tree, "tikz": draw_tikz_tree}
+
+job = None  # options of the run, set in every process by set_job
+
+
+def set_job(args):
+    global job
+    job = args
+
+
+def list_sources(pattern):
+    """
+    Yield (name, path, tree) for every tree to render. Files of a directory or a glob are loaded by the workers, the
+    trees of a single file are parsed here in one pass. Names are unique and serve as output names.
+    """
+    if os.path.isdir(pattern):
+        paths = sorted(entry.path for entry in os.scandir(pattern) if entry.is_file() and entry.name[0] != ".")
+    elif glob.has_magic(pattern):
+        paths = sorted(path for path in glob.glob(pattern) if os.path.isfile(path))
+    else:
+        paths = None
+
+    used = set()
+
+    def unique(name):
+        candidate, i = name, 1
+        while candidate in used:
+            i += 1
+            candidate = f"{name}_{i}"
+        used.add(candidate)
+        return candidate
+
+    if paths is not None:
+        for path in paths:
+            yield unique(os.path.splitext(os.path.basename(path))[0]), path, None
+        return
+
+    stem = os.path.splitext(os.path.basename(pattern))[0]
+    with open(pattern) as reader:
+        # a malformed tree is yielded as its error and the trees after it are still read
+        for index, tree in enumerate(parse_trees(reader, skip_errors=True)):
+            yield unique(f"{stem}_{index}"), pattern, tree
+
+
+def output_paths(args, name):
+    """
+    Output options of the drawing script for one tree and the files they produce. The profile reports get the name
+    of the tree as a prefix, like the outputs, so the trees do not overwrite each other's.
+    """
+    base = os.path.join(args.output_dir, name)
+    if args.format == "dot":
+        options, outputs = {"dot_name": f"{base}.dot"}, [f"{base}.dot", base]
+    elif args.script_args.backend != "tex":
+        options, outputs = {"tex_name": f"{base}.tex"}, [f"{base}.{args.script_args.backend}"]
+    else:
+        options, outputs = {"tex_name": f"{base}.tex"}, [f"{base}.tex", f"{base}_pages"]
+    for option in ("profile", "profile_stats"):
+        path = getattr(args.script_args, option)
+        if path is not None:
+            options[option] = f"{base}_{os.path.basename(path)}"
+            outputs.append(options[option])
+    return options, outputs
+
+
+def render_one(source):
+    """Render one tree, any failure is recorded in the result instead of stopping the batch."""
+    name, path, tree = source
+    args = job
+    result = {"name": name, "input": path, "outputs": [], "nodes": None, "leaves": None, "seconds": None,
+              "error": None}
+    start = time.perf_counter()
+    try:
+        if isinstance(tree, Exception):
+            raise tree
+        if tree is None:
+            tree = load_tree(path, cache_dir=None if args.no_cache else args.cache_dir, cache_size=args.cache_size)
+        result["nodes"], result["leaves"] = len(tree), int(tree.is_leaf.sum())
+
+        options, outputs = output_paths(args, name)
+        script_args = argparse.Namespace(**{**vars(args.script_args), **options,
+                                            "tree_file": path, "cache_dir": args.cache_dir,
+                                            "cache_size": args.cache_size, "no_cache": args.no_cache})
+        scripts[args.format].main(script_args, TreeSession(tree))
+        result["outputs"] = [output for output in outputs if os.path.exists(output)]
+    except Exception as error:
+        result["error"] = f"{type(error).__name__}: {error}"
+    result["seconds"] = round(time.perf_counter() - start, 3)
+    return result
+
+
+def render_parallel(args, sources):
+    """
+    Render the sources by a pool of processes. A worker that dies (e.g. killed when out of memory) breaks the pool
+    and every tree not finished yet, these are rendered again one by one, each in a process of its own, so only the
+    tree that kills its process is recorded with the error.
+    """
+    results = [None] * len(sources)
+    broken = []
+    with ProcessPoolExecutor(args.tree_workers, initializer=set_job, initargs=(args,)) as pool:
+        futures = [pool.submit(render_one, source) for source in sources]
+        for i, future in enumerate(futures):
+            try:
+                results[i] = future.result()
+            except BrokenProcessPool:
+                broken.append(i)
+
+    for i in broken:
+        with ProcessPoolExecutor(1, initializer=set_job, initargs=(args,)) as pool:
+            try:
+                results[i] = pool.submit(render_one, sources[i]).result()
+            except BrokenProcessPool:
+                name, path, _ = sources[i]
+                results[i] = {"name": name, "input": path, "outputs": [], "nodes": None, "leaves": None,
+                              "seconds": None, "error": "BrokenProcessPool: the process rendering the tree died"}
+    return results
+
+
+def main(args):
+    set_job(args)
+    os.makedirs(args.output_dir, exist_ok=True)
+    manifest_path = args.manifest or os.path.join(args.output_dir, "manifest.json")
+
+    sources = list_sources(args.input)
+    if args.tree_workers <= 1:
+        results = [render_one(source) for source in sources]
+    else:
+        results = render_parallel(args, list(sources))
+
+    with open(manifest_path, mode='w') as writer:
+        json.dump({"format": args.format, "options": vars(args.script_args), "trees": results}, writer, indent=1)
+
+    failed = [result for result in results if result["error"] is not None]
+    print(f"Rendered {len(results) - len(failed)} of {len(results)} trees, manifest in {manifest_path}.")
+    for result in failed:
+        print(f"{result['name']} ({result['input']}): {result['error']}")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    args, rest = parser.parse_known_args([] if "__file__" not in globals() else None)
+    args.script_args = scripts[args.format].parser.parse_args(rest)
+    raise SystemExit(main(args))
@@ -1,6 +1,10 @@
-import networkx as nx
-from Bio import Phylo as ph
 import argparse
+import os
+
+from treecont.api import prepare, render
+from treecont.batch import batch_main
+from treecont.defaults import default_cache_dir, default_cache_size, low_conf
+from treecont.profiling import Profiler
 
 parser = argparse.ArgumentParser()
 parser.add_argument("--tree_file",
@@ -27,357 +31,123 @@ parser.add_argument("--dfs_depth",
                     help="Maximal depth of the tree. If not specified, dfs contraction is not performed. Must be used "
                          "with the <do_contraction> switch."
                     )
+parser.add_argument("--max_visible_nodes",
+                    default=None,
+                    type=int,
+                    help="Contract the tree automatically so that at most this many nodes are drawn, the largest "
+                         "subtrees are expanded first. Replaces the dfs contraction, nodes from <to_contract> stay "
+                         "contracted. The chosen nodes are printed. Must be used with the <do_contraction> switch."
+                    )
+parser.add_argument("--max_root_distance",
+                    default=None,
+                    type=float,
+                    help="Contract every clade farther from the root than this sum of branch lengths. Replaces the dfs "
+                         "contraction, nodes from <to_contract> stay contracted. Must be used with the "
+                         "<do_contraction> switch."
+                    )
+parser.add_argument("--collapse_support",
+                    default=None, nargs="?", const=low_conf,
+                    type=float,
+                    help=f"Merge every inner node with a lower confidence into its parent, so its children form a "
+                         f"polytomy ({low_conf} without a value). Nodes are numbered after the merge."
+                    )
+parser.add_argument("--contract_by_name",
+                    default=None,
+                    type=str,
+                    help="Regular expression, contract the smallest subtree holding all leaves with a matching name. "
+                         "Must be used with the <do_contraction> switch."
+                    )
+parser.add_argument("--contract_by_taxon",
+                    default=None, nargs="?", const="",
+                    type=str,
+                    help="Taxa divided by commas (name suffixes, e.g. DAUCS,HELAN), contract every largest subtree "
+                         "whose leaves all belong to one of them. Without a value, all taxa are contracted. Must be "
+                         "used with the <do_contraction> switch."
+                    )
 parser.add_argument("--only_picture",
                     default=False,
                     dest='only_picture', action='store_true', help="Print only the big contracted picture, "
                                                                    "do not draw the subtrees."
                     )
+parser.add_argument("--backend",
+                    default="tex", choices=["tex", "svg", "pdf"],
+                    help="Output format. svg and pdf are written directly without pdflatex, next to <tex_name> "
+                         "with the matching suffix.",
+                    type=str)
+parser.add_argument("--workers",
+                    default=1, help="Number of processes generating the subtree pages. The output is the same as "
+                                    "with a single process.",
+                    type=int)
+parser.add_argument("--split_pages",
+                    default=False,
+                    dest='split_pages', help="Write every subtree page as its own document into <tex_name "
+                                             "without suffix>_pages, named by a hash of its contents. The tex file "
+                                             "then only holds the main picture and includes the compiled pages, "
+                                             "build it with compile_tikz_pages.py.",
+                    action='store_true')
+parser.add_argument("--batch",
+                    default=None, help="Json or yaml file with a list of configurations, each one maps options to "
+                                       "their values, e.g. [{\"dfs_depth\": 6, \"tex_name\": \"d6.tex\"}]. The tree "
+                                       "is loaded once and every configuration is rendered, the other options are "
+                                       "the defaults.",
+                    type=str)
+parser.add_argument("--batch_workers",
+                    default=1, help="Number of processes rendering the configurations of <batch>.",
+                    type=int)
+parser.add_argument("--profile",
+                    default=None, help="Path to a json report with the time, number of runs and peak memory of "
+                                       "every stage and statistics of the tree.",
+                    type=str)
+parser.add_argument("--profile_stats",
+                    default=None, help="Path for the cProfile statistics of the slowest stage, readable with pstats "
+                                       "or snakeviz. Must be used with <profile>.",
+                    type=str)
+parser.add_argument("--annotations",
+                    default=None, help="CSV file with a header and the columns name, category and optionally color "
+                                       "(#rrggbb only), nodes are colored by the categories of their leaves.",
+                    type=str)
+parser.add_argument("--color_mode",
+                    default="majority", choices=["majority", "proportional"],
+                    help="Color of a node with annotated leaves, the majority category or a stripe per category "
+                         "as wide as its share.",
+                    type=str)
+parser.add_argument("--cache_dir",
+                    default=default_cache_dir, help="Directory for the binary cache of parsed trees.",
+                    type=str)
+parser.add_argument("--cache_size",
+                    default=default_cache_size, help="Maximal size of the tree cache directory in MB.",
+                    type=int)
+parser.add_argument("--no_cache",
+                    default=False,
+                    dest='no_cache', help="Always parse the tree file, do not read or write the tree cache.",
+                    action='store_true')
 
-basic_conf_col = "black"
-confidence_colors = [
-    (0.9, f"{basic_conf_col}"),
-    (0.7, f"{basic_conf_col}!50"),
-    (0.5, f"{basic_conf_col}!10"),
-]
-low_conf = 0.5
-
-title = "A SUPER COOL PHYLOGENETIC TREE"
-
-
-def print_preabmle(treewr, TITLE, args):
-    print("\\documentclass{article}", file=treewr)
-    print("\\usepackage[x11names, svgnames, rgb]{xcolor}", file=treewr)
-    print("\\usepackage[utf8]{inputenc}", file=treewr)
-    print("\\usepackage{tikz}", file=treewr)
-    print("\\usepackage{scalefnt}", file=treewr)
-    print("\\usepackage{longtable}", file=treewr)
-    print("\\usetikzlibrary{snakes,arrows,shapes,calc}", file=treewr)
-    print("\\usepackage{amsmath}", file=treewr)
-    print("\\usepackage{colortbl}", file=treewr)
-    print("\\usepackage{geometry}", file=treewr)
-    print("\\geometry{a4paper, total={170mm,257mm}, left=10mm, top=5mm}", file=treewr)
-    print("\\usepackage[hidelinks]{hyperref}", file=treewr)
-
-    # use arial font
-    print("\\usepackage{helvet}\n\\renewcommand{\\familydefault}{\\sfdefault}", file=treewr)
-
-    print("\\begin{document}\n\\pagestyle{empty}\n\\enlargethispage{100cm}", file=treewr)
-
-    print("\\tikzset{\nhyperlink node/.style={\n"
-          "alias=sourcenode,\n"
-          "append after command={\n"
-          "let     \\p1 = (sourcenode.north west),\n"
-          "\\p2=(sourcenode.south east),"
-          "\\n1={\\x2-\\x1},\n"
-          "\\n2={\\y1-\\y2} in\n"
-          "node [inner sep=0pt, outer sep=0pt,anchor=north west,at=(\\p1)] "
-          "{\\hyperlink{#1}{\\XeTeXLinkBox{\\phantom{\\rule{\\n1}{\\n2}}}}}\n"
-          "}\n}\n}", file=treewr)
-    print("\n", file=treewr)
-
-    if not args.only_picture:
-        print("\\vspace*{8cm}", file=treewr)
-        print("{\\centering\\Large\\bfseries " + TITLE + "}", file=treewr)
-        print("\\\\", file=treewr)
-        # print("\\vfill{}", file=treewr)
-        print("{\\centering Click the taxon to get to the subtree details.}", file=treewr)
-        print("\\newpage", file=treewr)
-
-
-def generate_tree(treewr, treegraph, root='0', LR=False,
-                  paperwidth=257,
-                  nodestyle=lambda node: "draw=black,fill,rectangle,minimum height=10mm,minimum width=0.01cm",
-                  labelgen=lambda node: "",
-                  anchor="south east",
-                  special_features=lambda node, x, y, order, maxorder: None,
-                  paperheight=190, heightstep=None, widthstep=None
-                  ):
-    # kazdemu nodu urcit heightlvl a poradi v ranku
-    ranks_height = {}
-    ranks_width = {}
-
-    preds = nx.dfs_predecessors(treegraph, root)
-    succs = nx.dfs_successors(treegraph, root)
-
-    for vertex in treegraph.nodes():
-        current = vertex
-        level = 0
-        while current != root:
-            level += 1
-            current = preds[current]
-        ranks_height[vertex] = level
-
-    postorder = nx.dfs_postorder_nodes(treegraph, source=root)
-    leaves = [n for n, deg in treegraph.out_degree() if deg == 0]
-
-    widthlevel = 0
-    for node in postorder:
-        if node in leaves:
-            ranks_width[node] = widthlevel
-            widthlevel += 1
-
-    notleafs = sorted([n for n, deg in treegraph.out_degree() if deg > 0],
-                      key=lambda n: -ranks_height[n])
-    for notleaf in notleafs:
-        succ_widths = [ranks_width[s] for s in succs[notleaf]]
-        ranks_width[notleaf] = sum(succ_widths) / len(succ_widths)
-
-    # from nodes counts in levels assign step sizes if undefined
-    if widthstep is None:
-        widthstep = paperwidth / max(ranks_width.values())
-    if heightstep is None:
-        heightstep = paperheight / max(ranks_height.values())
-
-    print("\\begin{center}\n\\begin{tikzpicture}[>=latex',line join=bevel,"
-          "cross/.style={path picture={ \\draw[black] (path picture bounding box.south east) -- "
-          "(path picture bounding box.north west) (path picture bounding box.south west) -- "
-          "(path picture bounding box.north east);}}]"
-          "]", file=treewr)
-
-    if not LR:
-        maxorder = max(ranks_height.values())
-    else:
-        maxorder = max(ranks_width.values())
-
-    # print vertices
-    positions = {}  # vertex : "xmm,ymm"
-    for vertex in treegraph.nodes():
-        height, width = ranks_height[vertex], ranks_width[vertex]
-        nodelook = nodestyle(vertex)
-        if not LR:
-            x = width * widthstep
-            y = height * heightstep
-            order = height
-        else:
-            x = height * heightstep
-            y = width * widthstep
-            order = width
-        positioning = f"{x}mm,{y}mm"
-        positions[vertex] = (x, y)
-        print(f"\\node ({vertex}) at ({positioning}) [{nodelook}]" + " {};", file=treewr)
-        # node font=\\tiny
-
-        additional = special_features(vertex, x, y, order, maxorder)
-        if additional is not None:
-            print(additional, file=treewr)
-
-    # rooting
-    rootx, rooty = positions[root]
-    print(f"\\node (root) at ({rootx - heightstep}mm,{rooty}mm) [draw=black,ultra thin,fill,text width=0.01mm,"
-          f"inner sep=0pt,rectangle]" + " {};", file=treewr)
-    print(f"\\draw [very thick] (root) -- ({root});", file=treewr)
-
-    # print edges
-    for from_, to_ in treegraph.edges():
-        posi_from = positions[from_]
-        posi_to = positions[to_]
-        if LR:
-            midpoint = f"{posi_from[0]}mm,{posi_to[1]}mm"
-        else:
-            midpoint = f"{posi_to[0]}mm,{posi_from[1]}mm"
-        print(f"\\node ({from_}{to_}midpoint) at ({midpoint}) [draw=black,ultra thin,fill,text width=0.03mm,"
-              f"inner sep=0pt,rectangle]" + " {};", file=treewr)
-        print(f"\\draw [very thick] ({from_}) -- ({midpoint});", file=treewr)
-        print(f"\\draw [very thick] ({midpoint}) -- ({to_});", file=treewr)
-
-    for vertex in treegraph.nodes():
-        print(f"\\node ({vertex}label) at ({vertex}.west) [anchor={anchor}, font=\\tiny]" + " {" + labelgen(
-            vertex) + "};", file=treewr)
-
-    print("\\end{tikzpicture}\n\\end{center}", file=treewr)
-
-
-def main(args):
-    def load_tree(tree_file):
-        tree = ph.read(tree_file, 'newick')
-        graph = ph.to_networkx(tree)
-        node_info = {}
-
-        clade_nodes = {}
-
-        new_graph = nx.DiGraph()
-
-        for i, node in enumerate(graph.nodes):
-            clade_nodes[node] = i
-            name = node.name
-            node_info[f"{i}"] = {
-                "clade_info": node,
-                "name": name,
-                "contracted_sequences": None,
-                "color": ["grey"]  # can be adjusted through an external dictionary
-            }
-
-        for a, b in graph.edges:
-            current = ["", ""]
-            for i, node in enumerate([a, b]):
-                current[i] = f"{clade_nodes[node]}"
-
-            for item in current:
-                new_graph.add_node(item)
-            new_graph.add_edge(*current)
-
-        return new_graph, node_info
-
-    def do_contraction(to_contract, dfs_depth):
-        # contract specified nodes
-        if to_contract is not None:
-            for contract_node in to_contract:
-                node_contraction(contract_node)
-
-        if dfs_depth is not None:
-            shallow_tree = nx.dfs_tree(new_graph, '0', dfs_depth)
-            dfs_to_contract = ([n for n, deg in shallow_tree.out_degree() if deg == 0])
-            for contract_node in dfs_to_contract:
-                node_contraction(contract_node)
-
-    def node_contraction(contract_node):
-        if new_graph.out_degree(contract_node) == 0:
-            return
-
-        subtree = nx.dfs_tree(new_graph, contract_node)
-        following_nodes = subtree.nodes()
-
-        # contract info on the node
-        clade_infos, names, color = [], [], []
-        for x in following_nodes:
-            if info_on_node[x]["contracted_sequences"]:  # is contracted
-                clade_infos.extend(info_on_node[x]["clade_info"])
-                names.extend(info_on_node[x]["name"])
-
-                # color choosing -- this is fairly stupid and unusable
-                color.extend(info_on_node[x]["color"])
-
-            else:  # is not contracted
-                clade_infos.append(info_on_node[x]["clade_info"])
-                names.append(info_on_node[x]["name"])
-                color = info_on_node[x]["color"]
-
-        # manipulate_graph, save contracted info
-        new_graph.remove_nodes_from([x for x in following_nodes if x != contract_node])
-        info_on_node[contract_node] = {
-            "clade_info": clade_infos,
-            "contracted_sequences": True,
-            "name": names,
-            "color": color
-        }
-
-    new_graph, info_on_node = load_tree(args.tree_file)
-    entire_tree = new_graph.copy()
-    _, entire_tree_info_on_node = load_tree(args.tree_file)
-
-    if args.do_contraction:
-        node_ids_to_contract = [x for x in args.to_contract.split(',') if len(x) > 0]
-        do_contraction(node_ids_to_contract, args.dfs_depth)
-
-    with open(args.tex_name, mode='w') as treewr:
-        # preambule
-        print_preabmle(treewr, title, args)
-        root = '0'
-
-        def style_generator(vertex):
-            if new_graph.out_degree(vertex) > 0:
-                node_info = info_on_node[vertex]
-                represented_clade = node_info["clade_info"]
-                if (represented_clade.confidence is None) or (represented_clade.confidence < low_conf):
-                    return f"draw=black,ultra thin,fill,rectangle,text width=0.1mm,inner sep=0pt"
-                for thr, col in confidence_colors:
-                    if represented_clade.confidence >= thr:
-                        return f"draw=black, ultra thin, circle, fill={col}, minimum width=2mm, inner sep=0pt"
-
-            return "fill=black, rectangle, minimum height=0.55cm, text width=0.5mm, font={\\tiny}, inner sep=0pt, " \
-                   f"hyperlink node=subtree{vertex}"
-
-        def label_generator(vertex):
-            if new_graph.out_degree(vertex) > 0:
-                return ""
-            node_info = info_on_node[vertex]
-            if node_info["contracted_sequences"] is None:
-                return "1"
-            subtree_size = len([x for x in node_info["name"] if x is not None])
-            return f"{subtree_size}"
-
-        def style_generator_small(vertex):
-            if new_graph.out_degree(vertex) > 0:
-                node_info = info_on_node[vertex]
-                represented_clade = node_info["clade_info"]
-                if (represented_clade.confidence is None) or (represented_clade.confidence < low_conf):
-                    return f"draw=black,ultra thin,fill,rectangle,text width=0.1mm,inner sep=0pt"
-                for thr, col in confidence_colors:
-                    if represented_clade.confidence >= thr:
-                        return f"draw=black, ultra thin, circle, fill={col}, minimum width=2mm, inner sep=0pt"
-
-            return f"draw=black, fill, rectangle, minimum height=1cm, text width=0.5mm, inner sep=0pt"
-
-        def style_generator_subtree(vertex):
-            node_info = entire_tree_info_on_node[vertex]
-            if entire_tree.out_degree(vertex) > 0:
-                represented_clade = node_info["clade_info"]
-                if (represented_clade.confidence is None) or (represented_clade.confidence < low_conf):
-                    return f"draw=black,ultra thin,fill,rectangle,text width=0.5mm,inner sep=0pt"
-                for thr, col in confidence_colors:
-                    if represented_clade.confidence >= thr:
-                        return f"draw=black, ultra thin, circle, fill={col}, minimum width=1mm,inner sep=0pt"
-            else:
-                return f"draw=black,ultra thin,rectangle,fill=black,anchor=west,text width=1mm,inner sep=0pt"
 
-        # Colapsed overall tree -- generate tikz file
-        generate_tree(treewr, new_graph, LR=True,
-                      nodestyle=style_generator,
-                      labelgen=label_generator,
-                      heightstep=7,
-                      paperwidth=180)  # 270
+def main(args, session=None):
+    profiler = Profiler(enabled=args.profile is not None, cprofile=args.profile_stats is not None)
+    session, contraction, categories = prepare(args, profiler, session)
 
-        # Subtrees
+    with profiler.stage("layout"):
+        session.ranks(contraction)
         if not args.only_picture:
-            contracted = [n for n, deg in new_graph.out_degree() if deg == 0]
-            for contr_node in contracted:
-                print("\\newpage", file=treewr)
-                print("\\hypertarget{subtree" + contr_node + "}{\\section{Subtree details}}", file=treewr)
-                print("Click the node in the detailed tree to get to the details of the molecule.", file=treewr)
-                print("\\hspace*{-0.8cm}", file=treewr)
-
-                # node img in the contracted graph
-                shallow_tree = nx.dfs_tree(new_graph, contr_node)
-                generate_tree(treewr, shallow_tree, root=contr_node,
-                              LR=True,
-                              nodestyle=style_generator_small,
-                              labelgen=label_generator,
-                              widthstep=30,
-                              heightstep=7.5, paperwidth=50)
-
-                # entire subtree picture
-                subtree = nx.dfs_tree(entire_tree, contr_node)
-                w = 1.1
-
-                def moved_labels_subtree(vertex, x, y, order, maxorder):
-                    if entire_tree.out_degree(vertex) > 0:
-                        return ""
-                    node_info = info_on_node[vertex]
-                    name = node_info["name"].replace("_", " ")  # cant use _ in texfile
-
-                    name = f"\\tiny {name}"
+            session.global_ranks
 
-                    if (order % 2) == 0:
-                        result = f"\\node ({vertex}movedlabel) [anchor=west,minimum size=4mm,inner sep=0pt, " \
-                                 f"] at ({x + 55}mm,{y}mm) " + "{" + name + "};\n"
-                        result += f"\\draw [thin] ({vertex}) -- ({vertex}movedlabel);"
-                    else:
-                        result = f"\\node({vertex}movedlabel) [anchor=west,minimum size=4mm,inner sep=0pt] at ({x + 3}mm,{y}mm) " + "{" + name + "};"
-
-                    return result
-
-                generate_tree(treewr, subtree, root=contr_node,
-                              LR=True,
-                              nodestyle=style_generator_subtree,
-                              anchor="west",
-                              special_features=moved_labels_subtree,
-                              widthstep=w,
-                              heightstep=3)
+    if args.backend == "tex":
+        render(session, contraction, args.tex_name, format="tex", only_picture=args.only_picture,
+               workers=args.workers, split_pages=args.split_pages, categories=categories,
+               color_mode=args.color_mode, profiler=profiler)
+    else:
+        render(session, contraction, f"{os.path.splitext(args.tex_name)[0]}.{args.backend}", format=args.backend,
+               only_picture=args.only_picture, categories=categories, color_mode=args.color_mode,
+               profiler=profiler)
 
-                # here, an exhaustive table can be defined
-        print("\\end{document}", file=treewr)
+    if args.profile is not None:
+        profiler.write_report(args.profile, "draw_tikz_tree", args.profile_stats)
 
 
 if __name__ == '__main__':
     args = parser.parse_args([] if "__file__" not in globals() else None)
-    main(args)
+    if args.batch is None:
+        main(args)
+    else:
+        batch_main(args, main)
@@ -0,0 +1,53 @@
+import argparse
+import tempfile
+
+from treecont.cache import default_cache_dir, default_cache_size, load_tree
+from treecont.server import MemoryLRU, RenderService, serve
+from treecont.session import TreeSession
+
+parser = argparse.ArgumentParser(description="Load a tree once and render it over local HTTP, e.g. "
+                                             "/render?depth=6&contract=3,326,357&format=dot (dot, tex or svg). "
+                                             "/metrics shows the cache hit rates and the latencies.")
+parser.add_argument("--tree_file",
+                    default="tree.fst", help="Path to the input tree in Stockholm format.",
+                    type=str)
+parser.add_argument("--host",
+                    default="127.0.0.1", help="Address to listen on.",
+                    type=str)
+parser.add_argument("--port",
+                    default=8000, help="Port to listen on, 0 picks a free one.",
+                    type=int)
+parser.add_argument("--output_dir",
+                    default=None, help="Directory for the renders and the html indexes linked from the dot files. "
+                                       "A temporary directory if not given.",
+                    type=str)
+parser.add_argument("--output_cache_mb",
+                    default=256, help="Memory for the cached rendered documents in MB.",
+                    type=int)
+parser.add_argument("--view_cache_mb",
+                    default=256, help="Memory for the cached contractions, views and layouts in MB.",
+                    type=int)
+parser.add_argument("--cache_dir",
+                    default=default_cache_dir, help="Directory for the binary cache of parsed trees.",
+                    type=str)
+parser.add_argument("--cache_size",
+                    default=default_cache_size, help="Maximal size of the tree cache directory in MB.",
+                    type=int)
+parser.add_argument("--no_cache",
+                    default=False,
+                    dest='no_cache', help="Always parse the tree file, do not read or write the tree cache.",
+                    action='store_true')
+
+
+def main(args):
+    tree = load_tree(args.tree_file, cache_dir=None if args.no_cache else args.cache_dir, cache_size=args.cache_size)
+    session = TreeSession(tree, cache=MemoryLRU(args.view_cache_mb * 2 ** 20))
+    session.aggregates  # every render needs them
+    with tempfile.TemporaryDirectory() as temporary:
+        service = RenderService(session, args.output_dir or temporary, args.output_cache_mb)
+        serve(service, args.host, args.port)
+
+
+if __name__ == '__main__':
+    args = parser.parse_args([] if "__file__" not in globals() else None)
+    main(args)
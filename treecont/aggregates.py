@@ -0,0 +1,103 @@
+from collections.abc import Sequence
+from functools import cached_property
+
+import numpy as np
+
+
+def range_reduce(values, starts, ends, ufunc):
+    """
+    Reduce values[starts[i]:ends[i]] with ufunc for every i, the ranges must not be empty.
+
+    Works like a sparse table built one level at a time: level k holds the reductions of all ranges of length 2^k
+    and a range of length between 2^k and 2^(k+1) is covered by two overlapping ones. Only the current level is
+    kept, so the memory stays linear and the time is O((n + queries) log n) with vectorized steps only.
+    """
+    starts, ends = np.asarray(starts), np.asarray(ends)
+    lengths = ends - starts
+    result = np.empty(len(starts), dtype=values.dtype)
+    levels = np.frexp(lengths)[1] - 1  # floor of log2, exact for integers
+
+    table = np.array(values)
+    for level in range(int(levels.max(initial=0)) + 1):
+        if level > 0:
+            half = 1 << (level - 1)
+            table = ufunc(table[:-half], table[half:])
+        queries = np.flatnonzero(levels == level)
+        result[queries] = ufunc(table[starts[queries]], table[ends[queries] - (1 << level)])
+    return result
+
+
+class LeafNames(Sequence):
+    """Names of the given leaves, decoded only when accessed."""
+
+    def __init__(self, tree, leaves):
+        self.tree = tree
+        self.leaves = leaves
+
+    def __len__(self):
+        return len(self.leaves)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return LeafNames(self.tree, self.leaves[index])
+        return self.tree.name(self.leaves[index])
+
+
+class SubtreeAggregates:
+    """
+    Per-subtree summaries of a tree.
+
+    All values come from prefix sums and range reductions over the preorder intervals of the subtrees, so they are
+    computed without any per-node python work:
+
+    leaf_offset[v], leaf_count[v]: the leaves of the subtree of v are leaves[leaf_offset[v]:leaf_offset[v] +
+        leaf_count[v]], leaves being all leaves in their left-to-right order
+    total_branch_length[v]: sum of the branch lengths of the edges below v
+    min_depth[v], max_depth[v]: depth of the shallowest and the deepest leaf under v
+    min_support[v]: the lowest confidence of an inner node in the subtree of v, NaN if there is none
+    """
+
+    def __init__(self, tree):
+        self.tree = tree
+        is_leaf = tree.is_leaf
+
+        self.leaves = np.flatnonzero(is_leaf)
+        leaf_prefix = np.zeros(len(tree) + 1, dtype=np.int64)
+        np.cumsum(is_leaf, out=leaf_prefix[1:])
+        self.leaf_offset = leaf_prefix[:-1]
+        self.leaf_count = leaf_prefix[tree.subtree_end] - self.leaf_offset
+
+    # the other summaries are computed on first use, most renders need only the leaf ranges
+    @cached_property
+    def total_branch_length(self):
+        tree = self.tree
+        length_prefix = np.zeros(len(tree) + 1)
+        np.cumsum(np.nan_to_num(tree.branch_length), out=length_prefix[1:])
+        return length_prefix[tree.subtree_end] - length_prefix[1:]
+
+    def _leaf_depth_reduce(self, ufunc):
+        # every subtree has at least one leaf, so the leaf ranges are never empty
+        return range_reduce(self.tree.depth[self.leaves], self.leaf_offset, self.leaf_offset + self.leaf_count, ufunc)
+
+    @cached_property
+    def min_depth(self):
+        return self._leaf_depth_reduce(np.minimum)
+
+    @cached_property
+    def max_depth(self):
+        return self._leaf_depth_reduce(np.maximum)
+
+    @cached_property
+    def min_support(self):
+        tree = self.tree
+        support = np.where(tree.is_leaf | np.isnan(tree.confidence), np.inf, tree.confidence)
+        min_support = range_reduce(support, np.arange(len(tree)), tree.subtree_end, np.minimum)
+        return np.where(np.isinf(min_support), np.nan, min_support)
+
+    def subtree_leaves(self, node):
+        start = self.leaf_offset[node]
+        return self.leaves[start:start + self.leaf_count[node]]
+
+    def leaf_names(self, node):
+        """Names of the leaves under node in their left-to-right order, as a view without copying."""
+        return LeafNames(self.tree, self.subtree_leaves(node))
@@ -0,0 +1,101 @@
+import csv
+import re
+
+import numpy as np
+
+# colors of the categories without one in the annotation file
+palette = ["#1f77b4", "#ff7f0e", "#2ca02c", "#d62728", "#9467bd", "#8c564b", "#e377c2", "#7f7f7f", "#bcbd22",
+           "#17becf"]
+unannotated_color = "#bebebe"
+hex_color = re.compile(r"#[0-9a-fA-F]{6}")  # the only form all backends understand
+
+
+class Annotations:
+    """Categories with their colors and the category index of every annotated leaf name."""
+
+    def __init__(self, categories, colors, category_of):
+        self.categories = categories
+        self.colors = colors
+        self.category_of = category_of
+
+
+def read_annotations(path):
+    """
+    Read a csv file with a header and the columns name and category, optionally color (#rrggbb only). A category
+    takes the first color given for it, categories without any get an unused one of the palette.
+    """
+    categories, colors, category_of = [], [], {}
+    index = {}
+    with open(path, newline="") as reader:
+        rows = csv.DictReader(reader)
+        missing = {"name", "category"} - set(rows.fieldnames or ())
+        if missing:
+            raise ValueError(f"{path} has no column {', '.join(sorted(missing))}.")
+        for row in rows:
+            category = row["category"]
+            if category not in index:
+                index[category] = len(categories)
+                categories.append(category)
+                colors.append(None)
+            c = index[category]
+            color = (row.get("color") or "").strip()
+            if color and not hex_color.fullmatch(color):
+                raise ValueError(f"Color {color} of {category} in {path} is not in the form #rrggbb.")
+            if colors[c] is None and color:
+                colors[c] = color
+            category_of[row["name"]] = c
+
+    # palette colors are handed out in order, skipping the ones the file gives to other categories
+    free = [color for color in palette if color not in colors] or palette
+    missing = [c for c, color in enumerate(colors) if color is None]
+    for i, c in enumerate(missing):
+        colors[c] = free[i % len(free)]
+    return Annotations(categories, colors, category_of)
+
+
+class CategoryCounts:
+    """
+    Number of leaves of every category under a node, unannotated leaves are counted as the last category.
+
+    Leaves are joined with the annotations by name once, keeping the category of every leaf in leaf order. The
+    counts of the subtree of v are a bincount over its leaf range leaf_category[leaf_offset[v]:][:leaf_count[v]],
+    taken when v is drawn. The drawn leaves of a contraction have disjoint leaf ranges, so coloring a picture costs
+    O(leaves + categories x drawn nodes) time and the counts take O(leaves) memory, whatever the number of
+    categories.
+    """
+
+    def __init__(self, aggregates, annotations):
+        self.aggregates = aggregates
+        self.annotations = annotations
+        tree = aggregates.tree
+        k = len(annotations.categories)
+        category_of = annotations.category_of
+
+        self.leaf_category = np.fromiter((category_of.get(tree.name(leaf), k) for leaf in aggregates.leaves.tolist()),
+                                         dtype=np.int32, count=len(aggregates.leaves))
+        self.last = (None, None)  # a node is usually asked for its shares and its majority in a row
+
+    @property
+    def colors(self):
+        """Colors of all categories, the last one for unannotated leaves."""
+        return self.annotations.colors + [unannotated_color]
+
+    def counts(self, node):
+        if self.last[0] != node:
+            start = self.aggregates.leaf_offset[node]
+            leaves = self.leaf_category[start:start + self.aggregates.leaf_count[node]]
+            self.last = (node, np.bincount(leaves, minlength=len(self.annotations.categories) + 1))
+        return self.last[1]
+
+    def majority(self, node):
+        """The most frequent category of the annotated leaves under node, None if there are none."""
+        counts = self.counts(node)[:-1]
+        if len(counts) == 0 or counts.max() == 0:
+            return None
+        return int(counts.argmax())
+
+    def shares(self, node):
+        """(category, fraction of the leaves) for every category under node, unannotated leaves included."""
+        counts = self.counts(node)
+        total = counts.sum()
+        return [(c, count / total) for c, count in enumerate(counts.tolist()) if count > 0]
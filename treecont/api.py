@@ -0,0 +1,130 @@
+"""
+Drawing trees from python, the same steps the command line scripts take:
+
+    session = load("tree.sto")
+    contraction = contract(session, [3, 326, 357], dfs_depth=6)
+    render(session, contraction, "tree.dot", format="dot", helper_labels=True)
+
+Numpy and the modules doing the work are imported by the functions that need them, importing this module is cheap.
+"""
+from treecont.defaults import default_cache_dir, default_cache_size
+
+formats = ("dot", "tex", "svg", "pdf")
+
+
+def load(tree_file, cache_dir=default_cache_dir, cache_size=default_cache_size):
+    """Load a newick tree file through the tree cache (none if cache_dir is None) into a TreeSession."""
+    from treecont.cache import load_tree
+    from treecont.session import TreeSession
+
+    return TreeSession(load_tree(tree_file, cache_dir=cache_dir, cache_size=cache_size))
+
+
+def contract(session, to_contract=None, dfs_depth=None, max_visible_nodes=None, name_pattern=None, taxa=None,
+             max_root_distance=None):
+    """
+    Contraction of the session tree: the nodes of to_contract and then either every inner node in dfs_depth, every
+    clade farther than max_root_distance from the root (summed branch lengths) or as many as needed to draw at most
+    max_visible_nodes nodes. Without any of them the whole tree is drawn.
+
+    name_pattern also contracts the smallest subtree holding all leaves with a name matching the regular expression,
+    taxa every maximal subtree whose leaves all belong to one of the taxa (name suffixes like DAUCS), an empty list
+    stands for all taxa.
+    """
+    to_contract = list(to_contract or ())
+    if name_pattern is not None:
+        leaves = session.names.matching_leaves(name_pattern)
+        if len(leaves) == 0:
+            raise ValueError(f"No leaf name matches {name_pattern}.")
+        to_contract.append(session.names.smallest_clade(leaves))
+    if taxa is not None:
+        to_contract.extend(session.names.taxon_clades(taxa or None).tolist())
+
+    if not to_contract and dfs_depth is None and max_visible_nodes is None and max_root_distance is None:
+        return session.entire_tree
+    return session.contraction(to_contract, dfs_depth, max_visible_nodes, max_root_distance)
+
+
+def contraction_options(session, contraction):
+    """Command line options of the scripts drawing the same contraction, e.g. to keep one chosen by a budget."""
+    contracted = ",".join(str(x) for x in contraction.contracted.nonzero()[0].tolist())
+    # a dfs depth below the deepest node keeps the dfs contraction from changing anything
+    options = f"--dfs_depth {session.tree.depth.max() + 1}"
+    return f"--to_contract {contracted} {options}" if contracted else options
+
+
+def collapse(session, min_support):
+    """
+    Session of the tree with every inner node of confidence below min_support merged into its parent, the
+    children of such nodes form polytomies. Nodes are renumbered, nodes without a confidence are kept.
+    """
+    from treecont.session import TreeSession
+
+    tree = session.tree
+    return TreeSession(tree.collapse(tree.confidence < min_support))
+
+
+def layout(session, contraction):
+    """Drawn nodes in preorder, the mask of the drawn leaves among them and their ranks (depth and width)."""
+    nodes, leaves = session.view(contraction)
+    return nodes, leaves, session.ranks(contraction)
+
+
+def prepare(args, profiler, session=None):
+    """
+    The steps both drawing scripts take before they render, driven by their command line args: load the tree
+    (unless session is given), collapse it, read the annotations and contract it, each as a stage of profiler.
+    Returns the session (a new one if collapsed), the contraction and the category counts (None without
+    annotations).
+    """
+    # the loaded tree is never modified, contraction only hides subtrees when drawing
+    if session is None:
+        with profiler.stage("load"):
+            session = load(args.tree_file, cache_dir=None if args.no_cache else args.cache_dir,
+                           cache_size=args.cache_size)
+    if args.collapse_support is not None:
+        with profiler.stage("collapse"):
+            session = collapse(session, args.collapse_support)
+    with profiler.stage("aggregates"):
+        session.aggregates
+    categories = None
+    if args.annotations is not None:
+        with profiler.stage("annotations"):
+            categories = session.categories(args.annotations)
+
+    with profiler.stage("contraction"):
+        if args.do_contraction:
+            to_contract = [int(x) for x in (args.to_contract or "").split(',') if len(x) > 0]
+            taxa = None if args.contract_by_taxon is None else [x for x in args.contract_by_taxon.split(',') if x]
+            contraction = contract(session, to_contract, args.dfs_depth, args.max_visible_nodes,
+                                   args.contract_by_name, taxa, args.max_root_distance)
+        else:
+            contraction = session.entire_tree
+        nodes, leaves = session.view(contraction)
+    profiler.record_tree(session.tree, contraction, len(nodes))
+    if args.do_contraction and args.max_visible_nodes is not None:
+        print(f"Chosen contraction: {contraction_options(session, contraction)}")
+    return session, contraction, categories
+
+
+def render(session, contraction, path, format="dot", profiler=None, **options):
+    """
+    Write the contracted tree to path in one of the formats. The options are the keyword arguments of render_dot
+    (dot), render_tex (tex) or write_pages (svg and pdf).
+    """
+    if format == "dot":
+        from treecont.dot import render_dot
+
+        render_dot(session, contraction, path, profiler=profiler, **options)
+    elif format == "tex":
+        from treecont.tikz import render_tex
+
+        render_tex(session, contraction, path, profiler=profiler, **options)
+    elif format in ("svg", "pdf"):
+        from treecont.profiling import Profiler
+        from treecont.vector import write_pages
+
+        with (profiler or Profiler(enabled=False)).stage("output"):
+            write_pages(path, format, session, contraction, **options)
+    else:
+        raise ValueError(f"Unknown format {format}, use one of {', '.join(formats)}.")
@@ -0,0 +1,49 @@
+import argparse
+import json
+
+from treecont.api import load
+from treecont.parallel import fork_map
+
+# options of the whole batch, the tree is loaded once for all configurations
+batch_options = ("tree_file", "cache_dir", "cache_size", "no_cache", "batch", "batch_workers")
+
+
+def read_configs(path, known_options):
+    """
+    Read a list of render configurations from a json or yaml file. Every configuration maps option names (as in
+    the command line, without the dashes) to values, a list of node ids is accepted for to_contract. Yaml files
+    need PyYAML. The batch_options apply to all configurations and are rejected in a single one.
+    """
+    with open(path) as reader:
+        if path.endswith((".yaml", ".yml")):
+            import yaml  # only needed for yaml configurations
+            configs = yaml.safe_load(reader)
+        else:
+            configs = json.load(reader)
+
+    if not isinstance(configs, list) or not all(isinstance(config, dict) for config in configs):
+        raise ValueError(f"{path} must hold a list of configurations.")
+    for config in configs:
+        unknown = set(config) - set(known_options)
+        if unknown:
+            raise ValueError(f"Unknown option {sorted(unknown)[0]} in {path}.")
+        shared = [option for option in batch_options if option in config]
+        if shared:
+            raise ValueError(f"Option {shared[0]} in {path} applies to the whole batch, give it on the command line.")
+        if isinstance(config.get("to_contract"), list):
+            config["to_contract"] = ",".join(str(x) for x in config["to_contract"])
+    return configs
+
+
+def batch_main(args, main):
+    """
+    Render every configuration of the --batch file of a drawing script by its main(args, session), each with the
+    command line options in args overridden by the configuration. The tree is loaded once for all of them, with
+    batch_workers the configurations are rendered by forked processes sharing it.
+    """
+    session = load(args.tree_file, cache_dir=None if args.no_cache else args.cache_dir, cache_size=args.cache_size)
+    configs = read_configs(args.batch, vars(args))
+    session.aggregates  # computed before the workers are forked, so they share it
+    for _ in fork_map(lambda config: main(argparse.Namespace(**{**vars(args), **config}), session), configs,
+                      args.batch_workers):
+        pass
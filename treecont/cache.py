@@ -0,0 +1,147 @@
+import hashlib
+import json
+import mmap
+import os
+import tempfile
+
+import numpy as np
+
+from treecont.defaults import default_cache_dir, default_cache_size
+from treecont.newick import read_tree
+from treecont.tree import Tree, array_fields
+
+# bump when the layout of the cache files or the meaning of the stored arrays changes
+cache_version = 3
+magic = b"TREECONT"
+alignment = 64
+
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, mode='rb') as reader:
+        for block in iter(lambda: reader.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def aligned(offset):
+    return -(-offset // alignment) * alignment
+
+
+def write_cached_tree(tree, path):
+    """
+    Store the tree in one binary file that can be memory mapped.
+
+    The file starts with the magic bytes, the length of a json header and the header itself. The header lists the
+    dtype, length and offset of every array, the arrays and the name buffer follow at aligned offsets.
+    """
+    entries, offset = {}, 0
+    for field in array_fields:
+        array = getattr(tree, field)
+        entries[field] = {"dtype": array.dtype.str, "count": len(array), "offset": offset}
+        offset = aligned(offset + array.nbytes)
+    entries["name_data"] = {"count": len(tree.name_data), "offset": offset}
+
+    header = json.dumps({"version": cache_version, "entries": entries}).encode("utf-8")
+    data_start = aligned(len(magic) + 8 + len(header))
+
+    with open(path, mode='wb') as writer:
+        writer.write(magic)
+        writer.write(len(header).to_bytes(8, "little"))
+        writer.write(header)
+        for field in array_fields + ("name_data",):
+            writer.seek(data_start + entries[field]["offset"])
+            writer.write(getattr(tree, field))
+        writer.truncate(data_start + offset + len(tree.name_data))
+
+
+def read_cached_tree(path):
+    """Memory map a tree stored by write_cached_tree, raises ValueError if the file is not a valid cache file."""
+    with open(path, mode='rb') as reader:
+        if os.fstat(reader.fileno()).st_size < len(magic) + 8:
+            raise ValueError(f"{path} is not a tree cache file.")
+        buffer = mmap.mmap(reader.fileno(), 0, access=mmap.ACCESS_READ)
+
+    try:
+        if buffer[:len(magic)] != magic:
+            raise ValueError(f"{path} is not a tree cache file.")
+        header_length = int.from_bytes(buffer[len(magic):len(magic) + 8], "little")
+        header = json.loads(buffer[len(magic) + 8:len(magic) + 8 + header_length].decode("utf-8"))
+        if header["version"] != cache_version:
+            raise ValueError(f"{path} was written by another version of the cache.")
+
+        data_start = aligned(len(magic) + 8 + header_length)
+        entries = header["entries"]
+        names = entries["name_data"]
+        if data_start + names["offset"] + names["count"] > len(buffer):
+            raise ValueError(f"{path} is truncated.")
+
+        arrays = {field: np.frombuffer(buffer, dtype=entries[field]["dtype"], count=entries[field]["count"],
+                                       offset=data_start + entries[field]["offset"])
+                  for field in array_fields}
+        start = data_start + names["offset"]
+        name_data = memoryview(buffer)[start:start + names["count"]]
+    except (KeyError, UnicodeDecodeError, json.JSONDecodeError) as error:
+        raise ValueError(f"{path} has a broken header.") from error
+
+    return Tree.from_arrays(arrays, name_data)
+
+
+def shrink_cache(cache_dir, max_bytes, keep=None):
+    """Delete the least recently used cache files until the directory fits into max_bytes."""
+    entries = []
+    for entry in os.scandir(cache_dir):
+        if entry.name.endswith(".tree") and entry.path != keep:
+            info = entry.stat()
+            entries.append((info.st_mtime, info.st_size, entry.path))
+
+    total = sum(size for _, size, _ in entries)
+    if keep is not None and os.path.exists(keep):
+        total += os.path.getsize(keep)
+
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:  # removed by a concurrent run
+            pass
+        total -= size
+
+
+def load_tree(tree_file, cache_dir=default_cache_dir, cache_size=default_cache_size):
+    """
+    Load the tree from the cache directory, the file is parsed and the result stored only on a cache miss.
+
+    Cache files are named by the content hash of the tree file, so any change of the input misses the cache. The
+    cache directory is kept under cache_size MB by removing the least recently used files. No cache is used if
+    cache_dir is None.
+    """
+    if cache_dir is None:
+        return read_tree(tree_file)
+
+    os.makedirs(cache_dir, exist_ok=True)
+    path = os.path.join(cache_dir, f"{file_hash(tree_file)}.tree")
+
+    if os.path.exists(path):
+        try:
+            tree = read_cached_tree(path)
+            os.utime(path)  # mark as recently used
+            return tree
+        except ValueError:  # stale or broken, parse again
+            os.remove(path)
+
+    tree = read_tree(tree_file)
+
+    # write to a temporary file first, concurrent runs never see a half written cache file
+    writer, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+    os.close(writer)
+    try:
+        write_cached_tree(tree, tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    shrink_cache(cache_dir, cache_size * 1024 * 1024, keep=path)
+    return tree
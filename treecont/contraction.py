@@ -0,0 +1,98 @@
+import heapq
+
+import numpy as np
+
+
+class Contraction:
+    """
+    Contracted view of a tree.
+
+    Contracting a node is only a flag, the tree itself is never changed. A contracted node is drawn as a leaf
+    standing for its whole subtree, and since every subtree is a contiguous range of preorder ids, the nodes hidden
+    below contracted nodes are found by one pass over the flags.
+    """
+
+    def __init__(self, tree):
+        self.tree = tree
+        self.flags = np.zeros(len(tree), dtype=bool)
+        self._visible = None
+
+    def contract(self, nodes):
+        nodes = np.asarray(nodes, dtype=np.int64)
+        unknown = nodes[(nodes < 0) | (nodes >= len(self.tree))]
+        if len(unknown) > 0:
+            raise ValueError(f"Node {unknown[0]} is not in the tree.")
+
+        # contracting a leaf changes nothing
+        self.flags[nodes[~self.tree.is_leaf[nodes]]] = True
+        self._visible = None
+
+    def contract_depth(self, depth):
+        """Contract every inner node in the given depth, which leaves no drawn node deeper."""
+        self.flags |= (self.tree.depth == depth) & ~self.tree.is_leaf
+        self._visible = None
+
+    def contract_distance(self, distance):
+        """Contract every inner node farther than distance from the root whose parent is not, like contract_depth."""
+        tree = self.tree
+        beyond = tree.root_distance > distance
+        first = beyond.copy()
+        first[1:] &= ~beyond[tree.parent[1:]]
+        self.flags |= first & ~tree.is_leaf
+        self._visible = None
+
+    def contract_to_budget(self, max_visible):
+        """
+        Contract the tree so that at most max_visible nodes are drawn, returns the newly contracted nodes.
+
+        Starting from the root alone, the largest contracted subtree is opened as long as its children still fit
+        into the budget. Nodes contracted before stay contracted.
+        """
+        tree = self.tree
+        subtree_size = tree.subtree_end - np.arange(len(tree), dtype=np.int32)
+        chosen = []
+
+        drawn = 1
+        candidates = [] if self.is_drawn_leaf(0) else [(-subtree_size[0], 0)]
+        while candidates:
+            _, node = heapq.heappop(candidates)
+            children = tree.children_of(node)
+            if drawn + len(children) > max_visible:
+                chosen.append(node)
+                continue
+
+            drawn += len(children)
+            for child in children.tolist():
+                if not self.is_drawn_leaf(child):
+                    heapq.heappush(candidates, (-subtree_size[child], child))
+
+        chosen.sort()
+        self.contract(chosen)
+        return chosen
+
+    @property
+    def visible(self):
+        """Mask of the nodes with no contracted ancestor."""
+        if self._visible is None:
+            flagged = np.flatnonzero(self.flags)
+            n = len(self.tree)
+            # +1 where a hidden range starts, -1 where it ends
+            cover = np.bincount(flagged + 1, minlength=n + 1) - np.bincount(self.tree.subtree_end[flagged],
+                                                                            minlength=n + 1)
+            self._visible = np.cumsum(cover[:n]) == 0
+        return self._visible
+
+    @property
+    def contracted(self):
+        """Mask of the drawn contracted nodes, flagged nodes hidden by a contracted ancestor are not included."""
+        return self.flags & self.visible
+
+    def is_drawn_leaf(self, node):
+        return bool(self.flags[node] or self.tree.is_leaf[node])
+
+    def view(self, root=0):
+        """Drawn nodes of the subtree of root in preorder, together with the mask of the drawn leaves among them."""
+        end = self.tree.subtree_end[root]
+        nodes = np.flatnonzero(self.visible[root:end]) + root
+        leaves = self.flags[nodes] | self.tree.is_leaf[nodes]
+        return nodes, leaves
@@ -0,0 +1,7 @@
+import os
+
+# kept apart from the cache module, so the command line parsers do not import numpy
+default_cache_dir = os.path.join(os.environ.get("XDG_CACHE_HOME", os.path.join(os.path.expanduser("~"), ".cache")),
+                                 "treecont")
+default_cache_size = 1024  # MB
+low_conf = 0.5  # nodes with a lower confidence are drawn as unsupported and can be collapsed
@@ -0,0 +1,176 @@
+import math
+import os
+
+import numpy as np
+
+from treecont.emit import chunked, open_output, write_lines
+from treecont.html_index import data_name, index_lines, viewer, viewer_name, viewer_url
+from treecont.profiling import Profiler
+
+default_color = "grey"  # nodes without annotated leaves, see treecont.annotations
+nodesep = 2  # inches
+
+
+def build_subtree_label(aggregates, node, helper_labels=False):
+    subtree_size = aggregates.leaf_count[node]  # no of sequences in subtree
+
+    if helper_labels:
+        label = f"v={node}\n{subtree_size} seqs"
+    else:
+        label = f"{subtree_size} seqs"
+
+    return label
+
+
+def build_leaf_label(name, row=30):
+    t = '\n'.join([name[x * row:x * row + row] for x in range(math.ceil(len(name) / row))])
+    return t
+
+
+def html_lines(names):
+    yield "<!DOCTYPE HTML>\n<html>"
+    yield "<body>"
+    yield "<table>"
+    # header
+    yield "<tr>"
+    yield "<th>Sequence identificator</th>\n"
+    yield "</tr>"
+    # elements
+
+    for name in names:
+        if name is None:
+            continue
+
+        yield "<tr>"
+        yield f"<td>{name}</td>\n"
+        yield "</tr>"
+    yield "</table>"
+    yield "<br>"
+
+    yield "</body>"
+    yield "</html>"
+
+
+def make_html_file(html_dir, node, names):
+    filename = f"{html_dir}/subtree_{node}.html"
+    os.makedirs(html_dir, exist_ok=True)
+
+    with open_output(filename) as writer:
+        write_lines(writer, html_lines(names))
+
+    return filename
+
+
+def compute_positions(ranks, entry_width):
+    # leaves are spaced by their width and the node separation, root on top, all in points
+    x = ranks[:, 1] * (entry_width + nodesep) * 72
+    y = (ranks[:, 0].max() - ranks[:, 0]) * (entry_width // 2 + 1) * 72
+    return x, y
+
+
+def node_color(categories, vertex):
+    """Fill of the majority category of the leaves under vertex, the default without annotated leaves."""
+    majority = None if categories is None else categories.majority(vertex)
+    return default_color if majority is None else categories.colors[majority]
+
+
+def stripes(categories, vertex):
+    """Graphviz striped fill with a stripe per category, as wide as its share of the leaves under vertex."""
+    shares = categories.shares(vertex)
+    # the last stripe takes the rest, rounded shares could sum up to more than 1
+    return ":".join([f"{categories.colors[c]};{share:.3f}" for c, share in shares[:-1]]
+                    + [categories.colors[shares[-1][0]]])
+
+
+def dot_lines(session, contraction, html_dir, entry_width=15, fontsize=50, helper_labels=False, positions=False,
+              html_index=False, categories=None, color_mode="majority"):
+    """
+    Lines of the dot file, the html file of every contracted node is written when its line is generated. With
+    categories (CategoryCounts), nodes are filled by the majority category of their leaves or, in the proportional
+    color_mode, contracted nodes are drawn as boxes with a stripe per category.
+    """
+    tree, aggregates = session.tree, session.aggregates
+    nodes, leaves = session.view(contraction)
+    proportional = categories is not None and color_mode == "proportional"
+
+    yield "graph {"
+    # yield "rankdir=\"LR\""
+    yield "splines=\"false\""
+    yield "overlap=\"false\""
+    yield f"ranksep=\"{entry_width // 2}\""
+    yield f"nodesep=\"{nodesep}\""
+    yield f"fontsize=\"{fontsize}\""
+
+    contracted = contraction.contracted
+    parents = np.searchsorted(nodes, tree.parent[nodes[1:]])
+    # positions are formatted while the lines are emitted, a list of all of them would outgrow the tree
+    coordinates = compute_positions(session.ranks(contraction), entry_width) if positions else ()
+
+    for vertex, *xy in chunked(nodes, *coordinates):
+        place = f", pos=\"{xy[0]:.2f},{xy[1]:.2f}!\"" if positions else ""
+        if contracted[vertex]:
+            label = build_subtree_label(aggregates, vertex, helper_labels)
+            if html_index:
+                htmlfile = viewer_url(html_dir, vertex)
+            else:
+                htmlfile = make_html_file(html_dir, vertex, aggregates.leaf_names(vertex))
+
+            if proportional:  # graphviz draws stripes only in boxes
+                shape, style, color = "box", "striped", stripes(categories, vertex)
+            else:
+                shape, style, color = "triangle", "filled", node_color(categories, vertex)
+            yield (f"{vertex} [shape=\"{shape}\", color=\"black\", width={entry_width}, style=\"{style}\", "
+                   f"fillcolor=\"{color}\", label=\"{label}\", fontsize={fontsize}, URL=\"{htmlfile}\""
+                   f"{place}]")
+        else:
+            name, confidence = tree.name(vertex), tree.get_confidence(vertex)
+            if name is None:
+                if confidence is None:
+                    yield f"{vertex} [shape=\"point\", color=\"black\"{place}]"
+                else:
+                    if helper_labels:
+                        yield (f"{vertex} [shape=\"box\", width=1, color=\"black\", label=\"v={vertex}\", "
+                               f"fontsize={fontsize}{place}]")
+                    else:
+                        yield f"{vertex} [shape=\"point\", color=\"black\"{place}]"
+            else:
+                label = build_leaf_label(name)
+                color = node_color(categories, vertex)
+                yield (f"{vertex} [shape=\"box\", color=\"black\", width={entry_width}, style=\"filled\", "
+                       f"fillcolor=\"{color}\", label=\"{label}\", fontsize={fontsize}{place}]")
+
+    children = chunked(nodes[1:], *(coordinate[1:] for coordinate in coordinates))
+    for (v, *child), (u, *parent) in zip(children, chunked(nodes, *coordinates, at=parents)):
+        pos = ""
+        if positions:
+            # elbow from the parent, over to the child and down
+            (x, y), (px, py) = child, parent
+            pos = (f", pos=\"{px:.2f},{py:.2f} {px:.2f},{py:.2f} {x:.2f},{py:.2f} {x:.2f},{py:.2f} {x:.2f},{py:.2f} "
+                   f"{x:.2f},{y:.2f} {x:.2f},{y:.2f}\"")
+        # yield f"{u} -- {v} [headport=w, tailport=e];"
+        yield f"{u} -- {v} [headport=n, tailport=s{pos}];"
+
+    yield "}"
+
+
+def render_dot(session, contraction, dot_name, entry_width=15, fontsize=50, helper_labels=False, positions=False,
+               html_index=False, categories=None, color_mode="majority", profiler=None):
+    """
+    Write the contracted tree as a dot file, gzip compressed if dot_name ends with .gz. The sequence lists of the
+    contracted nodes go to a directory named like the dot file, as one html file per node or as one html_index.
+    """
+    profiler = profiler or Profiler(enabled=False)
+    # the html files keep the name of the dot file without suffixes
+    html_dir = dot_name[:-7] if dot_name.endswith(".gz") else dot_name[:-4]
+    with profiler.stage("output"):
+        with open_output(dot_name) as treewr:
+            write_lines(treewr, dot_lines(session, contraction, html_dir, entry_width, fontsize, helper_labels,
+                                          positions, html_index, categories, color_mode))
+
+    if html_index:
+        with profiler.stage("html_index"):
+            os.makedirs(html_dir, exist_ok=True)
+            with open_output(os.path.join(html_dir, data_name)) as writer:
+                write_lines(writer, index_lines(session.aggregates, np.flatnonzero(contraction.contracted).tolist()))
+            with open(os.path.join(html_dir, viewer_name), mode='w') as writer:
+                print(viewer, file=writer)
@@ -0,0 +1,34 @@
+import gzip
+from itertools import islice
+
+batch_size = 1 << 14  # lines joined into one write
+buffer_size = 1 << 20
+
+
+def open_output(path):
+    """Open a text file for writing with a large buffer, gzip compressed on the fly if the name ends with .gz."""
+    if path.endswith(".gz"):
+        return gzip.open(path, mode='wt', compresslevel=6)
+    return open(path, mode='w', buffering=buffer_size)
+
+
+def write_lines(writer, lines):
+    """Write the lines generated by an emitter, each one followed by a newline like print does, in large batches."""
+    lines = iter(lines)
+    while True:
+        batch = list(islice(lines, batch_size))
+        if not batch:
+            return
+        batch.append("")
+        writer.write("\n".join(batch))
+
+
+def chunked(*arrays, at=None):
+    """
+    Zip of numpy arrays converted to python values batch_size elements at a time, so that emitters never copy a
+    whole array into a list. With an index array at, the arrays are read at its positions instead of in order.
+    """
+    length = len(arrays[0]) if at is None else len(at)
+    for start in range(0, length, batch_size):
+        part = slice(start, start + batch_size) if at is None else at[start:start + batch_size]
+        yield from zip(*(array[part].tolist() for array in arrays))
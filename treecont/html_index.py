@@ -0,0 +1,61 @@
+import json
+
+data_name = "subtrees.js"
+viewer_name = "index.html"
+
+# shows the names of the subtree given by the anchor, like #subtree_12, the data is a script so it also loads from disk
+viewer = """<!DOCTYPE HTML>
+<html>
+<head>
+<meta charset="utf-8">
+<script src="subtrees.js"></script>
+</head>
+<body>
+<table id="names">
+</table>
+<br>
+<script>
+function show() {
+    var table = document.getElementById("names");
+    table.innerHTML = "<tr><th>Sequence identificator</th></tr>";
+    var range = subtree_ranges[window.location.hash.replace("#subtree_", "")];
+    if (range === undefined) {
+        return;
+    }
+    for (var i = range[0]; i < range[0] + range[1]; i++) {
+        if (subtree_names[i] === null) {
+            continue;
+        }
+        var cell = table.insertRow().insertCell();
+        cell.textContent = subtree_names[i];
+    }
+}
+window.addEventListener("hashchange", show);
+show();
+</script>
+</body>
+</html>"""
+
+
+def index_lines(aggregates, nodes):
+    """
+    Lines of the data file of the viewer. The leaf names of the subtrees of nodes are stored one after another and
+    every subtree is given by the offset and the count of its names.
+    """
+    yield "var subtree_names = ["
+    for node in nodes:
+        for name in aggregates.leaf_names(node):
+            yield json.dumps(name) + ","
+    yield "];"
+
+    yield "var subtree_ranges = {"
+    offset = 0
+    for node in nodes:
+        count = int(aggregates.leaf_count[node])
+        yield f"\"{node}\": [{offset}, {count}],"
+        offset += count
+    yield "};"
+
+
+def viewer_url(html_dir, node):
+    return f"{html_dir}/{viewer_name}#subtree_{node}"
@@ -0,0 +1,54 @@
+import numpy as np
+
+
+def layout(tree, nodes, leaves):
+    """
+    Rank coordinates of the drawn part of a tree.
+
+    nodes are the drawn node ids in preorder, starting with the root of the picture, and leaves is a boolean mask
+    over nodes marking the drawn leaves. Returns a float array of shape (len(nodes), 2): the first column is the
+    depth below the picture root, the second the width rank. Leaves are numbered in their left-to-right order and
+    every inner node sits at the mean of the width ranks of its children.
+    """
+    nodes = np.asarray(nodes, dtype=np.int64)
+    leaves = np.asarray(leaves, dtype=bool)
+    m = len(nodes)
+
+    ranks = np.empty((m, 2))
+    height = tree.depth[nodes] - tree.depth[nodes[0]]
+    ranks[:, 0] = height
+    width = ranks[:, 1]
+    width[leaves] = np.arange(np.count_nonzero(leaves))  # preorder keeps the leaves in postorder order
+    if m == 1:
+        return ranks
+
+    # parents as positions in nodes, nodes are sorted because preorder ids are increasing
+    parent = np.searchsorted(nodes, tree.parent[nodes[1:]])
+    child = np.arange(1, m)
+    child_count = np.bincount(parent, minlength=m)
+    child_sum = np.zeros(m)
+
+    # inner nodes are finished once the level below them is, so go level by level from the deepest one
+    by_height = np.argsort(height[1:], kind="stable")
+    level_ends = np.cumsum(np.bincount(height[1:]))
+    for level in range(len(level_ends) - 1, 0, -1):
+        in_level = by_height[level_ends[level - 1]:level_ends[level]]
+        inner = child[in_level][~leaves[child[in_level]]]
+        width[inner] = child_sum[inner] / child_count[inner]
+        np.add.at(child_sum, parent[in_level], width[child[in_level]])
+
+    if not leaves[0]:
+        width[0] = child_sum[0] / child_count[0]
+    return ranks
+
+
+def subtree_ranks(ranks, tree, node):
+    """
+    Ranks of the subtree of node cut out of the ranks of the whole tree, ranks being layout(tree, all nodes,
+    tree.is_leaf). The result equals layout of the subtree alone, its rows are the nodes node .. subtree_end[node]-1.
+    """
+    end = tree.subtree_end[node]
+    ranks = ranks[node:end] - ranks[node, 0]
+    first_leaf = np.argmax(tree.is_leaf[node:end])  # leftmost leaf of the subtree, preorder reaches it first
+    ranks[:, 1] -= ranks[first_leaf, 1]
+    return ranks
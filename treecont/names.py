@@ -0,0 +1,115 @@
+import re
+
+import numpy as np
+
+from treecont.aggregates import range_reduce
+
+
+taxon_suffix = re.compile(r"_([A-Z0-9]{1,5})$")  # UniProt species mnemonic
+
+
+def taxon_of(name):
+    """Species suffix of a UniProt-style name (DAUCS for Q9XGC6_DAUCS), empty without one."""
+    match = taxon_suffix.search(name or "")
+    return "" if match is None else match.group(1)
+
+
+def lowest_common_ancestor(tree, u, v):
+    """
+    Lowest common ancestor of the nodes u <= v.
+
+    In preorder the nodes between u < v include the child of their LCA on the path to v and nothing shallower, so
+    the LCA is the parent of the shallowest node of (u, v], the range minimum of the Euler tour method taken over
+    the preorder. One argmin over the range costs O(v - u), without a table over the whole tree.
+    """
+    if u == v:
+        return u
+    return int(tree.parent[u + 1 + np.argmin(tree.depth[u + 1:v + 1])])
+
+
+class NameIndex:
+    """
+    Leaves of a tree by name and by taxon.
+
+    Leaves are numbered by their position among all leaves (aggregates.leaves), leaf_taxon gives the taxon of
+    every leaf as an index into taxa. The leaves of taxon t are taxon_leaves[taxon_offsets[t]:taxon_offsets[t + 1]]
+    in their left-to-right order, so a query for some taxa visits only their leaves and the clades made of them.
+    Names are decoded once when the index is built, only the taxa are kept.
+    """
+
+    def __init__(self, tree, aggregates):
+        self.tree = tree
+        self.aggregates = aggregates
+
+        taxa = [taxon_of(tree.name(leaf)) for leaf in aggregates.leaves.tolist()]
+        self.taxa, self.leaf_taxon = np.unique(np.array(taxa, dtype=object), return_inverse=True)
+        self.leaf_taxon = self.leaf_taxon.astype(np.int32)
+        self.taxon_ids = {taxon: i for i, taxon in enumerate(self.taxa.tolist())}
+        self.taxon_leaves = np.argsort(self.leaf_taxon, kind="stable").astype(np.int32)
+        self.taxon_offsets = np.zeros(len(self.taxa) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(self.leaf_taxon, minlength=len(self.taxa)), out=self.taxon_offsets[1:])
+
+    def taxon_id(self, taxon):
+        if taxon not in self.taxon_ids:
+            raise ValueError(f"No leaf name ends with _{taxon}.")
+        return self.taxon_ids[taxon]
+
+    def matching_leaves(self, pattern):
+        """Node ids of the leaves with a name matching the regular expression anywhere."""
+        pattern = re.compile(pattern)
+        tree = self.tree
+        return np.array([leaf for leaf in self.aggregates.leaves.tolist() if pattern.search(tree.name(leaf) or "")],
+                        dtype=np.int64)
+
+    def smallest_clade(self, leaves):
+        """The root of the smallest subtree holding all the leaves, the LCA of the leftmost and the rightmost."""
+        if len(leaves) == 0:
+            raise ValueError("No leaves to find the clade of.")
+        return lowest_common_ancestor(self.tree, int(np.min(leaves)), int(np.max(leaves)))
+
+    def taxon_clades(self, taxa=None):
+        """
+        Roots of the maximal subtrees with at least two leaves, all of them of one of the taxa. Every taxon but the
+        empty one (names without a suffix) if taxa is None, found for all of them at once by range reductions over
+        the whole tree; given taxa are looked up in the index instead.
+        """
+        if taxa is not None:
+            clades = [clade for taxon in taxa for clade in self.clades_of_taxon(self.taxon_id(taxon))]
+            return np.array(sorted(clades), dtype=np.int64)
+
+        tree, aggregates = self.tree, self.aggregates
+        ends = aggregates.leaf_offset + aggregates.leaf_count
+        lowest = range_reduce(self.leaf_taxon, aggregates.leaf_offset, ends, np.minimum)
+        monophyletic = lowest == range_reduce(self.leaf_taxon, aggregates.leaf_offset, ends, np.maximum)
+
+        parent_monophyletic = np.zeros(len(tree), dtype=bool)
+        parent_monophyletic[1:] = monophyletic[tree.parent[1:]]
+        maximal = monophyletic & ~parent_monophyletic & ~tree.is_leaf & (self.taxa[lowest] != "")
+        return np.flatnonzero(maximal)
+
+    def clades_of_taxon(self, t):
+        """
+        Maximal subtrees with at least two leaves, all of taxon t. A subtree made of the taxon covers leaves of one
+        run of consecutive leaves of the taxon, so every run is covered from its left end by climbing from a leaf
+        as long as the parent stays inside the run. The cost is the number of nodes made of the taxon.
+        """
+        tree, aggregates = self.tree, self.aggregates
+        leaves, leaf_offset, leaf_count = aggregates.leaves, aggregates.leaf_offset, aggregates.leaf_count
+        positions = self.taxon_leaves[self.taxon_offsets[t]:self.taxon_offsets[t + 1]]
+        run_starts = np.flatnonzero(np.diff(positions, prepend=-2) != 1)
+        run_ends = np.append(run_starts[1:], len(positions))
+
+        clades = []
+        for start, end in zip(positions[run_starts].tolist(), (positions[run_ends - 1] + 1).tolist()):
+            position = start
+            while position < end:
+                node = int(leaves[position])
+                while node != 0:
+                    parent = tree.parent[node]
+                    if leaf_offset[parent] < start or leaf_offset[parent] + leaf_count[parent] > end:
+                        break
+                    node = parent
+                if leaf_count[node] > 1:
+                    clades.append(int(node))
+                position = int(leaf_offset[node] + leaf_count[node])
+        return clades
@@ -0,0 +1,227 @@
+import math
+import re
+from array import array
+
+import numpy as np
+
+from treecont.tree import Tree
+
+# same tokens as the Bio.Phylo newick parser, whitespace and newlines are skipped
+tokenizer = re.compile(r"\(|\)|,|;"
+                       r"|\[(?:\\.|[^\]])*\]"
+                       r"|'(?:\\.|[^'])*'"
+                       r"|:\ ?[+-]?[0-9]*\.?[0-9]+(?:[eE][+-]?[0-9]+)?"
+                       r"|[^\s()\[\]':;,]+")
+
+delimiters = {"(", ")", ",", ";"}
+chunk_size = 1 << 20
+
+
+def parse_confidence(text):
+    if text.isdigit():
+        return int(text)
+    try:
+        return float(text)
+    except ValueError:
+        return None
+
+
+def tokenize(handle):
+    """Yield newick tokens from a text file handle read in chunks, a token may span several chunks."""
+    rest = ""
+    while True:
+        chunk = handle.read(chunk_size)
+        text = rest + chunk
+        if not chunk:
+            yield from (m.group() for m in tokenizer.finditer(text))
+            return
+
+        # only tokens up to the last parenthesis, comma or semicolon are complete, a label or a number before the
+        # chunk end can continue in the next one, and so can text no token matches (an unterminated quote or comment)
+        tokens, complete, end = [], 0, 0
+        for match in tokenizer.finditer(text):
+            if text[end:match.start()].strip():
+                break
+            token, end = match.group(), match.end()
+            tokens.append(token)
+            if token in delimiters:
+                complete, consumed = len(tokens), end
+        if complete:
+            yield from tokens[:complete]
+            rest = text[consumed:]
+        else:
+            rest = text
+
+
+class TreeBuilder:
+    """
+    Collects the nodes of one tree in the order of their opening tokens, which is preorder.
+
+    Labels are kept as strings only while their node is open. A closed node's name is encoded into one buffer in the
+    order the nodes close, and name_start and name_length locate it there. build reorders the buffer into preorder.
+    This way the builder holds a few bytes per node and the name bytes, but no python object per node.
+    """
+
+    def __init__(self):
+        self.parent = array("i")
+        self.branch_length = array("d")
+        self.confidence = array("d")
+        self.name_data = bytearray()
+        self.name_start = array("q")
+        self.name_length = array("i")
+        self.labels = {}  # labels of the open nodes
+        self.inner = bytearray()
+        self.outer_root = None  # node created for a tree without the outermost parentheses
+        self.open_count, self.close_count = 0, 0
+        self.current = self.new_node(-1)
+
+    def new_node(self, parent):
+        node = len(self.parent)
+        self.parent.append(parent)
+        self.branch_length.append(float("nan"))
+        self.confidence.append(float("nan"))
+        self.name_start.append(0)
+        self.name_length.append(0)
+        self.inner.append(0)
+        if parent >= 0:
+            self.inner[parent] = 1
+        return node
+
+    def close_node(self, node):
+        name = self.labels.pop(node, None)
+        if name:
+            # numeric labels of inner nodes are support values
+            confidence = parse_confidence(name) if self.inner[node] and math.isnan(self.confidence[node]) else None
+            if confidence is not None:
+                self.confidence[node] = confidence
+            else:
+                encoded = name.encode("utf-8")
+                self.name_start[node] = len(self.name_data)
+                self.name_length[node] = len(encoded)
+                self.name_data += encoded
+        return self.parent[node]
+
+    def add_token(self, token):
+        current = self.current
+        if token == "(":
+            self.current = self.new_node(current)
+            self.open_count += 1
+        elif token == ",":
+            if self.parent[current] == -1:
+                # the root has siblings, the outermost parentheses are missing
+                self.outer_root = self.new_node(-1)
+                self.parent[current] = self.outer_root
+                self.inner[self.outer_root] = 1
+            self.current = self.new_node(self.close_node(current))
+        elif token == ")":
+            parent = self.close_node(current)
+            if parent == -1:
+                raise ValueError("Parenthesis mismatch.")
+            self.current = parent
+            self.close_count += 1
+        elif token[0] == ":":
+            self.branch_length[current] = float(token[1:])
+        elif token[0] == "'":
+            if not self.labels.get(current):
+                self.labels[current] = token[1:-1]
+            else:  # escaped quote inside a quoted label
+                self.labels[current] += token[:-1]
+        elif token[0] != "[":  # comments are ignored
+            self.labels[current] = token
+
+    def build(self):
+        if self.open_count != self.close_count:
+            raise ValueError(f"Mismatch, {self.open_count} open vs {self.close_count} close parentheses.")
+        self.close_node(self.current)
+        root = 0 if self.outer_root is None else self.outer_root
+        if root != self.current:
+            self.close_node(root)
+
+        parent = np.frombuffer(self.parent, dtype=np.int32)
+        branch_length = np.frombuffer(self.branch_length, dtype=np.float64)
+        confidence = np.frombuffer(self.confidence, dtype=np.float64)
+        name_start = np.frombuffer(self.name_start, dtype=np.int64)
+        name_length = np.frombuffer(self.name_length, dtype=np.int32)
+
+        if self.outer_root is not None:
+            # move the late created root to the front, nodes created before it shift by one
+            k = self.outer_root
+            order = np.concatenate(([k], np.arange(k), np.arange(k + 1, len(parent))))
+            parent = parent[order]
+            parent = np.where(parent == k, 0, np.where((parent >= 0) & (parent < k), parent + 1, parent))
+            branch_length, confidence = branch_length[order], confidence[order]
+            name_start, name_length = name_start[order], name_length[order]
+
+        name_offsets, name_data = gather_names(self.name_data, name_start, name_length)
+        return Tree(parent, branch_length, confidence, name_offsets, name_data)
+
+
+def gather_names(data, starts, lengths, block=1 << 16):
+    """Concatenate data[starts[i]:starts[i] + lengths[i]] in the order of i, as offsets and one bytes buffer."""
+    offsets = np.zeros(len(starts) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    named = lengths > 0
+    if np.array_equal(starts[named], offsets[:-1][named]):  # names were closed in preorder, usual without labels
+        return offsets, data
+
+    source = np.frombuffer(data, dtype=np.uint8)
+    gathered = np.empty(offsets[-1], dtype=np.uint8)
+    # the byte positions are built for a block of names at a time, so they do not take 8 bytes per name byte
+    for first in range(0, len(starts), block):
+        last = min(first + block, len(starts))
+        shift = np.repeat(starts[first:last] - offsets[first:last], lengths[first:last])
+        gathered[offsets[first]:offsets[last]] = source[shift + np.arange(offsets[first], offsets[last])]
+    return offsets, gathered.tobytes()
+
+
+def parse_trees(handle, skip_errors=False):
+    """
+    Iterate over the trees of a newick text file handle, in a single pass without recursion. With skip_errors a
+    malformed tree is yielded as its ValueError and reading goes on after the next ';'.
+    """
+    builder, failed = None, None
+    for token in tokenize(handle):
+        if token == ";":
+            if failed is not None:
+                yield failed
+            else:
+                try:
+                    yield (builder or TreeBuilder()).build()
+                except ValueError as error:
+                    if not skip_errors:
+                        raise
+                    yield error
+            builder, failed = None, None
+            continue
+        if failed is not None:  # the rest of a malformed tree
+            continue
+        if builder is None:
+            builder = TreeBuilder()
+        try:
+            builder.add_token(token)
+        except ValueError as error:
+            if not skip_errors:
+                raise
+            failed = error
+
+    if failed is not None:
+        yield failed
+    elif builder is not None:  # the last tree is missing the terminal ';'
+        try:
+            yield builder.build()
+        except ValueError as error:
+            if not skip_errors:
+                raise
+            yield error
+
+
+def read_tree(tree_file):
+    """Read the only tree of a newick file."""
+    with open(tree_file) as reader:
+        trees = parse_trees(reader)
+        tree = next(trees, None)
+        if tree is None:
+            raise ValueError(f"There are no trees in {tree_file}.")
+        if next(trees, None) is not None:
+            raise ValueError(f"There are multiple trees in {tree_file}.")
+    return tree
@@ -0,0 +1,30 @@
+import multiprocessing
+
+forked_function = None  # set before the worker processes are forked, they inherit it with everything it uses
+
+
+def call_forked(item):
+    return forked_function(item)
+
+
+def fork_map(function, items, workers=1):
+    """
+    Yield function(item) for the items in their order.
+
+    With more workers the items are handed to forked processes, which inherit the function and everything computed
+    before, so only the items and the results are sent between the processes. Without fork, for a single item or in
+    a process of another pool (which can not start its own) the items are mapped here.
+    """
+    global forked_function
+    if workers <= 1 or len(items) < 2 or "fork" not in multiprocessing.get_all_start_methods() \
+            or multiprocessing.current_process().daemon:
+        yield from map(function, items)
+        return
+
+    forked_function = function
+    try:
+        with multiprocessing.get_context("fork").Pool(workers) as pool:
+            chunksize = max(1, len(items) // (4 * workers))
+            yield from pool.imap(call_forked, items, chunksize=chunksize)
+    finally:
+        forked_function = None
@@ -0,0 +1,62 @@
+import cProfile
+import json
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+
+class Profiler:
+    """
+    Wall time, number of runs and peak memory of the stages of a render.
+
+    Stages must not be nested. Memory is traced with tracemalloc from the start of a stage, so the peak is the most
+    memory the stage allocated at once. With cprofile every stage also runs under its own cProfile profile and the
+    profile of the slowest stage can be dumped. A disabled profiler does nothing.
+    """
+
+    def __init__(self, enabled=True, cprofile=False):
+        self.enabled = enabled
+        self.cprofile = cprofile
+        self.stages = {}
+        self.profiles = {}
+        self.tree_stats = {}
+
+    @contextmanager
+    def stage(self, name):
+        if not self.enabled:
+            yield
+            return
+
+        stats = self.stages.setdefault(name, {"seconds": 0.0, "calls": 0, "peak_mb": 0.0})
+        profile = self.profiles.setdefault(name, cProfile.Profile()) if self.cprofile else None
+        tracemalloc.start()
+        if profile is not None:
+            profile.enable()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            stats["seconds"] += time.perf_counter() - start
+            if profile is not None:
+                profile.disable()
+            stats["calls"] += 1
+            stats["peak_mb"] = max(stats["peak_mb"], tracemalloc.get_traced_memory()[1] / 2 ** 20)
+            tracemalloc.stop()
+
+    def record_tree(self, tree, contraction, visible_nodes):
+        if self.enabled:
+            self.tree_stats = {"nodes": len(tree), "leaves": int(tree.is_leaf.sum()),
+                               "max_depth": int(tree.depth.max()),
+                               "contracted_nodes": int(contraction.contracted.sum()), "visible_nodes": visible_nodes}
+
+    def write_report(self, path, script, stats_path=None):
+        """Write the json report and, if requested, the cProfile statistics of the slowest stage."""
+        hottest = max(self.stages, key=lambda name: self.stages[name]["seconds"], default=None)
+        report = {"script": script, "tree": self.tree_stats, "stages": self.stages,
+                  "total_seconds": sum(stats["seconds"] for stats in self.stages.values()),
+                  "hottest_stage": hottest, "cprofile": None}
+        if stats_path is not None and hottest in self.profiles:
+            self.profiles[hottest].dump_stats(stats_path)
+            report["cprofile"] = stats_path
+        with open(path, mode='w') as writer:
+            json.dump(report, writer, indent=1)
@@ -0,0 +1,243 @@
+import collections
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+
+from treecont.api import contract, render
+from treecont.contraction import Contraction
+
+content_types = {"dot": "text/vnd.graphviz", "tex": "application/x-tex", "svg": "image/svg+xml"}
+latency_window = 1000  # latencies of the last requests kept for the percentiles
+
+
+def nbytes(value):
+    """Approximate memory of a cached value, counting the arrays and buffers it owns."""
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, (bytes, str)):
+        return len(value)
+    if isinstance(value, (tuple, list)):
+        return sum(nbytes(x) for x in value)
+    if isinstance(value, Contraction):
+        # the tree is shared by all contractions, only the flags and the visibility mask built by the first view
+        # belong to one; the mask is charged up front since the contraction is cached before it is viewed
+        return value.flags.nbytes * 2
+    return 0
+
+
+class MemoryLRU:
+    """
+    Least recently used cache holding at most max_bytes of values, sized by nbytes. A value larger than the whole
+    cache is not kept. Counts hits, misses and evictions. on_evict(key, value) is called for every value that is
+    dropped or not kept, to release what it holds outside the memory.
+    """
+
+    def __init__(self, max_bytes, on_evict=None):
+        self.max_bytes = max_bytes
+        self.on_evict = on_evict
+        self.entries = collections.OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        if key not in self.entries:
+            self.misses += 1
+            return default
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return self.entries[key][0]
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def __getitem__(self, key):
+        value = self.get(key, self)
+        if value is self:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value):
+        if key in self.entries:
+            self.size -= self.entries.pop(key)[1]
+        size = nbytes(value)
+        if size > self.max_bytes:
+            if self.on_evict is not None:
+                self.on_evict(key, value)
+            return
+        self.entries[key] = (value, size)
+        self.size += size
+        while self.size > self.max_bytes:
+            evicted_key, (evicted, evicted_size) = self.entries.popitem(last=False)
+            self.size -= evicted_size
+            self.evictions += 1
+            if self.on_evict is not None:
+                self.on_evict(evicted_key, evicted)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {"entries": len(self.entries), "mb": self.size / 2 ** 20, "max_mb": self.max_bytes / 2 ** 20,
+                "hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else None}
+
+
+class RenderService:
+    """
+    Renders of one loaded tree by query parameters, see parse_query. Rendered documents are cached in outputs, the
+    contractions, views and layouts in the cache of the session. Requests are rendered one at a time.
+
+    Only dot renders leave files in output_dir, the dot file and the html index it links, and they are deleted when
+    the document leaves the cache, so the directory holds no more renders than the cache. The other formats are
+    rendered in a temporary directory.
+    """
+
+    def __init__(self, session, output_dir, output_cache_mb=256):
+        self.session = session
+        self.output_dir = output_dir
+        self.outputs = MemoryLRU(output_cache_mb * 2 ** 20, on_evict=self.remove_output)
+        self.lock = threading.Lock()
+        self.latencies = collections.deque(maxlen=latency_window)
+        self.requests = 0
+        self.errors = 0
+
+    @staticmethod
+    def parse_query(query):
+        """
+        Render options of a query string: depth (dfs depth), contract (node ids divided by commas), format (dot, tex
+        or svg) and only_picture (tex without the subtree pages). Raises ValueError on a malformed query.
+        """
+        params = {key: values[-1] for key, values in parse_qs(query).items()}
+        unknown = set(params) - {"depth", "contract", "format", "only_picture"}
+        if unknown:
+            raise ValueError(f"Unknown parameters: {', '.join(sorted(unknown))}.")
+
+        format = params.get("format", "dot")
+        if format not in content_types:
+            raise ValueError(f"Unknown format {format}, use one of {', '.join(content_types)}.")
+        try:
+            depth = int(params["depth"]) if "depth" in params else None
+            to_contract = tuple(sorted({int(x) for x in params.get("contract", "").split(",") if len(x) > 0}))
+        except ValueError:
+            raise ValueError("depth and contract must be integers.") from None
+        only_picture = params.get("only_picture", "0") not in ("0", "false", "")
+        return to_contract, depth, format, only_picture
+
+    def handle(self, query):
+        """Rendered document of a query and whether it came from the cache."""
+        key = self.parse_query(query)
+        with self.lock:
+            document = self.outputs.get(key)
+            if document is not None:
+                return document, True
+
+            to_contract, depth, format, only_picture = key
+            contraction = contract(self.session, list(to_contract), depth)
+            if format == "dot":
+                # the dot file links the html index of the render, so both stay until the document is evicted
+                path = f"{self.output_name(key)}.dot"
+                try:
+                    render(self.session, contraction, path, format="dot", html_index=True)
+                    with open(path, mode='rb') as reader:
+                        document = reader.read()
+                except Exception:
+                    self.remove_output(key)
+                    raise
+            else:
+                with tempfile.TemporaryDirectory() as directory:
+                    path = os.path.join(directory, f"render.{format}")
+                    render(self.session, contraction, path, format=format, only_picture=only_picture)
+                    with open(path, mode='rb') as reader:
+                        document = reader.read()
+
+            self.outputs[key] = document
+            return document, False
+
+    def output_name(self, key):
+        """Path of the files of a dot render in the output directory, without the extension."""
+        return os.path.join(self.output_dir, hashlib.sha256(repr(key).encode()).hexdigest()[:20])
+
+    def remove_output(self, key, document=None):
+        if key[2] != "dot":
+            return
+        name = self.output_name(key)
+        if os.path.exists(f"{name}.dot"):
+            os.remove(f"{name}.dot")
+        shutil.rmtree(name, ignore_errors=True)
+
+    def record(self, seconds, failed=False):
+        self.requests += 1
+        self.errors += failed
+        self.latencies.append(seconds)
+
+    def metrics(self):
+        latencies = np.array(self.latencies)
+        if len(latencies) > 0:
+            latency = {"count": len(latencies), "mean_ms": latencies.mean() * 1000,
+                       "p50_ms": np.percentile(latencies, 50) * 1000, "p95_ms": np.percentile(latencies, 95) * 1000,
+                       "max_ms": latencies.max() * 1000}
+        else:
+            latency = {"count": 0}
+        return {"requests": self.requests, "errors": self.errors, "latency": latency,
+                "outputs": self.outputs.stats(),
+                "views": self.session.cache.stats() if isinstance(self.session.cache, MemoryLRU) else None}
+
+
+class RenderHandler(BaseHTTPRequestHandler):
+    """GET /render?<query> answers a render, GET /metrics the cache and latency metrics as json."""
+
+    service = None  # set by serve
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == "/metrics":
+            self.respond(200, "application/json", json.dumps(self.service.metrics(), indent=1).encode())
+            return
+        if url.path not in ("/", "/render"):
+            self.respond(404, "text/plain", b"Use /render?depth=6&contract=3,326&format=dot or /metrics.\n")
+            return
+
+        start = time.perf_counter()
+        try:
+            document, hit = self.service.handle(url.query)
+        except ValueError as error:
+            self.service.record(time.perf_counter() - start, failed=True)
+            self.respond(400, "text/plain", f"{error}\n".encode())
+            return
+        except Exception as error:
+            # a failed render must not drop the connection without an answer or go missing from the metrics
+            self.service.record(time.perf_counter() - start, failed=True)
+            body = {"error": type(error).__name__, "message": str(error)}
+            self.respond(500, "application/json", json.dumps(body).encode())
+            return
+        self.service.record(time.perf_counter() - start)
+        format = self.service.parse_query(url.query)[2]
+        self.respond(200, content_types[format], document, {"X-Cache": "hit" if hit else "miss"})
+
+    def respond(self, status, content_type, body, headers=None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def serve(service, host="127.0.0.1", port=8000):
+    """Answer requests until interrupted."""
+    handler = type("Handler", (RenderHandler,), {"service": service})
+    with ThreadingHTTPServer((host, port), handler) as server:
+        print(f"Serving on http://{host}:{server.server_address[1]}/render?depth=6&format=dot", flush=True)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
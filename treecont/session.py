@@ -0,0 +1,86 @@
+from functools import cached_property
+
+from treecont.aggregates import SubtreeAggregates
+from treecont.annotations import CategoryCounts, read_annotations
+from treecont.contraction import Contraction
+from treecont.layout import layout
+from treecont.names import NameIndex
+
+
+class TreeSession:
+    """
+    A loaded tree together with the work derived from it, computed on first use and shared by all renders of the
+    tree. Contractions are shared between renders asking for the same contraction, and so are their layouts.
+    Views and layouts are cached together with their contraction, so its id is not reused while they are cached.
+    """
+
+    def __init__(self, tree, cache=None):
+        self.tree = tree
+        # contractions, views and layouts by kind and key, a bounded cache (e.g. MemoryLRU) can replace the dict
+        self.cache = {} if cache is None else cache
+
+    @cached_property
+    def aggregates(self):
+        return SubtreeAggregates(self.tree)
+
+    @cached_property
+    def names(self):
+        return NameIndex(self.tree, self.aggregates)
+
+    def categories(self, annotations_file):
+        """Category counts of the leaves annotated in a csv file, see read_annotations."""
+        categories = self.cache.get(("categories", annotations_file))
+        if categories is None:
+            categories = CategoryCounts(self.aggregates, read_annotations(annotations_file))
+            self.cache[("categories", annotations_file)] = categories
+        return categories
+
+    @cached_property
+    def entire_tree(self):
+        """Contraction that is never contracted."""
+        return Contraction(self.tree)
+
+    def contraction(self, to_contract=None, dfs_depth=None, max_visible_nodes=None, max_root_distance=None):
+        """
+        Contract the given nodes and then either every inner node in dfs_depth, every clade farther than
+        max_root_distance from the root, or as many as needed to draw at most max_visible_nodes nodes, the first
+        given of the last two. The result must not be changed, it is shared.
+        """
+        key = ("contraction", tuple(sorted(set(to_contract or ()))), dfs_depth, max_visible_nodes, max_root_distance)
+        contraction = self.cache.get(key)
+        if contraction is not None:
+            return contraction
+
+        contraction = Contraction(self.tree)
+        # contract specified nodes
+        if to_contract:
+            contraction.contract(to_contract)
+
+        if max_visible_nodes is not None:
+            contraction.contract_to_budget(max_visible_nodes)
+        elif max_root_distance is not None:
+            contraction.contract_distance(max_root_distance)
+        elif dfs_depth is not None:
+            contraction.contract_depth(dfs_depth)
+
+        self.cache[key] = contraction
+        return contraction
+
+    def view(self, contraction):
+        """Drawn nodes and the mask of the drawn leaves of a contraction made by this session."""
+        entry = self.cache.get(("view", id(contraction)))
+        if entry is None:
+            entry = self.cache[("view", id(contraction))] = (contraction, contraction.view())
+        return entry[1]
+
+    def ranks(self, contraction):
+        """Layout ranks of the drawn nodes of a contraction made by this session."""
+        entry = self.cache.get(("layout", id(contraction)))
+        if entry is None:
+            entry = self.cache[("layout", id(contraction))] = (contraction, layout(self.tree, *self.view(contraction)))
+        return entry[1]
+
+    @property
+    def global_ranks(self):
+        """Layout ranks of the whole tree, subtree_ranks cuts the layout of any subtree out of them."""
+        return self.ranks(self.entire_tree)
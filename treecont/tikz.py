@@ -0,0 +1,341 @@
+import hashlib
+import io
+import os
+import re
+
+import numpy as np
+
+from treecont.defaults import low_conf
+from treecont.emit import chunked, open_output, write_lines
+from treecont.layout import layout, subtree_ranks
+from treecont.parallel import fork_map
+from treecont.profiling import Profiler
+
+basic_conf_col = "black"
+confidence_colors = [
+    (0.9, f"{basic_conf_col}"),
+    (0.7, f"{basic_conf_col}!50"),
+    (0.5, f"{basic_conf_col}!10"),
+]
+
+title = "A SUPER COOL PHYLOGENETIC TREE"
+page_name_pattern = re.compile(r"[0-9a-f]{20}")  # names of the page documents, see write_page_document
+
+
+def category_colors(colors):
+    """Define the xcolor colors category0, category1, ... from #rrggbb colors."""
+    for i, color in enumerate(colors):
+        yield f"\\definecolor{{category{i}}}{{HTML}}{{{color[1:].upper()}}}"
+
+
+def proportional_fill(shares):
+    """Fill a node with a bar per category stacked bottom up, each as high as its share of the leaves."""
+    box = "path picture bounding box"
+    bars, bottom = [], 0.0
+    for category, share in shares:
+        top = bottom + share
+        bars.append(f"\\fill[category{category}] ($({box}.south west)!{bottom:.3f}!({box}.north west)$) rectangle "
+                    f"($({box}.south east)!{top:.3f}!({box}.north east)$);")
+        bottom = top
+    return "fill=white, path picture={" + " ".join(bars) + "}"
+
+
+def print_preabmle(treewr, TITLE, only_picture=False, title_page=True, packages=(), colors=()):
+    print("\\documentclass{article}", file=treewr)
+    print("\\usepackage[x11names, svgnames, rgb]{xcolor}", file=treewr)
+    print("\\usepackage[utf8]{inputenc}", file=treewr)
+    print("\\usepackage{tikz}", file=treewr)
+    print("\\usepackage{scalefnt}", file=treewr)
+    print("\\usepackage{longtable}", file=treewr)
+    print("\\usetikzlibrary{snakes,arrows,shapes,calc}", file=treewr)
+    print("\\usepackage{amsmath}", file=treewr)
+    print("\\usepackage{colortbl}", file=treewr)
+    print("\\usepackage{geometry}", file=treewr)
+    print("\\geometry{a4paper, total={170mm,257mm}, left=10mm, top=5mm}", file=treewr)
+    for package in packages:
+        print("\\usepackage{" + package + "}", file=treewr)
+    print("\\usepackage[hidelinks]{hyperref}", file=treewr)
+    for line in category_colors(colors):
+        print(line, file=treewr)
+
+    # use arial font
+    print("\\usepackage{helvet}\n\\renewcommand{\\familydefault}{\\sfdefault}", file=treewr)
+
+    print("\\begin{document}\n\\pagestyle{empty}\n\\enlargethispage{100cm}", file=treewr)
+
+    print("\\tikzset{\nhyperlink node/.style={\n"
+          "alias=sourcenode,\n"
+          "append after command={\n"
+          "let     \\p1 = (sourcenode.north west),\n"
+          "\\p2=(sourcenode.south east),"
+          "\\n1={\\x2-\\x1},\n"
+          "\\n2={\\y1-\\y2} in\n"
+          "node [inner sep=0pt, outer sep=0pt,anchor=north west,at=(\\p1)] "
+          "{\\hyperlink{#1}{\\XeTeXLinkBox{\\phantom{\\rule{\\n1}{\\n2}}}}}\n"
+          "}\n}\n}", file=treewr)
+    print("\n", file=treewr)
+
+    if title_page and not only_picture:
+        print("\\vspace*{8cm}", file=treewr)
+        print("{\\centering\\Large\\bfseries " + TITLE + "}", file=treewr)
+        print("\\\\", file=treewr)
+        # print("\\vfill{}", file=treewr)
+        print("{\\centering Click the taxon to get to the subtree details.}", file=treewr)
+        print("\\newpage", file=treewr)
+
+
+def write_page_document(document, pages_dir):
+    """Store a standalone page document named by the hash of its text, unchanged pages keep their compiled pdf."""
+    page_name = hashlib.sha256(document.encode("utf-8")).hexdigest()[:20]
+    path = os.path.join(pages_dir, f"{page_name}.tex")
+    if not os.path.exists(path):
+        with open(f"{path}.tmp", mode='w') as pagewr:
+            pagewr.write(document)
+        os.replace(f"{path}.tmp", path)
+    return page_name
+
+
+def prune_pages(pages_dir, page_names):
+    """Remove the page documents of pages_dir not in page_names, with the pdf and the other files latex made of them."""
+    for entry in os.scandir(pages_dir):
+        stem = entry.name.split(".")[0]
+        if entry.is_file() and page_name_pattern.fullmatch(stem) and stem not in page_names:
+            os.remove(entry.path)
+
+
+def tree_lines(tree, nodes, leaves, LR=False,
+               paperwidth=257,
+               nodestyle=lambda node: "draw=black,fill,rectangle,minimum height=10mm,minimum width=0.01cm",
+               labelgen=lambda node: "",
+               anchor="south east",
+               special_features=lambda node, x, y, order, maxorder: None,
+               paperheight=190, heightstep=None, widthstep=None, ranks=None
+               ):
+    # nodes are the drawn nodes in preorder starting with the root, leaves marks the drawn leaves among them
+    root = nodes[0]
+
+    # kazdemu nodu urcit heightlvl a poradi v ranku, unless they were cut out of a bigger layout
+    if ranks is None:
+        ranks = layout(tree, nodes, leaves)
+    ranks_height = ranks[:, 0].astype(int)
+    ranks_width = ranks[:, 1]
+
+    # from nodes counts in levels assign step sizes if undefined, a single node has no extent
+    if widthstep is None:
+        widthstep = paperwidth / max(ranks_width.max(), 1)
+    if heightstep is None:
+        heightstep = paperheight / max(ranks_height.max(), 1)
+
+    yield ("\\begin{center}\n\\begin{tikzpicture}[>=latex',line join=bevel,"
+           "cross/.style={path picture={ \\draw[black] (path picture bounding box.south east) -- "
+           "(path picture bounding box.north west) (path picture bounding box.south west) -- "
+           "(path picture bounding box.north east);}}]"
+           "]")
+
+    if not LR:
+        xs, ys, orders = ranks_width * widthstep, ranks_height * heightstep, ranks_height
+    else:
+        xs, ys, orders = ranks_height * heightstep, ranks_width * widthstep, ranks_width
+    maxorder = orders.max().item()
+
+    # print vertices
+    for vertex, x, y, order in chunked(nodes, xs, ys, orders):
+        nodelook = nodestyle(vertex)
+        positioning = f"{x}mm,{y}mm"
+        yield f"\\node ({vertex}) at ({positioning}) [{nodelook}]" + " {};"
+        # node font=\\tiny
+
+        additional = special_features(vertex, x, y, order, maxorder)
+        if additional is not None:
+            yield additional
+
+    # rooting
+    rootx, rooty = xs[0].item(), ys[0].item()
+    yield (f"\\node (root) at ({rootx - heightstep}mm,{rooty}mm) [draw=black,ultra thin,fill,text width=0.01mm,"
+           f"inner sep=0pt,rectangle]" + " {};")
+    yield f"\\draw [very thick] (root) -- ({root});"
+
+    # print edges
+    parents = np.searchsorted(nodes, tree.parent[nodes[1:]])
+    for (to_, *posi_to), (from_, *posi_from) in zip(chunked(nodes[1:], xs[1:], ys[1:]),
+                                                     chunked(nodes, xs, ys, at=parents)):
+        if LR:
+            midpoint = f"{posi_from[0]}mm,{posi_to[1]}mm"
+        else:
+            midpoint = f"{posi_to[0]}mm,{posi_from[1]}mm"
+        yield (f"\\node ({from_}{to_}midpoint) at ({midpoint}) [draw=black,ultra thin,fill,text width=0.03mm,"
+               f"inner sep=0pt,rectangle]" + " {};")
+        yield f"\\draw [very thick] ({from_}) -- ({midpoint});"
+        yield f"\\draw [very thick] ({midpoint}) -- ({to_});"
+
+    for vertex, in chunked(nodes):
+        yield f"\\node ({vertex}label) at ({vertex}.west) [anchor={anchor}, font=\\tiny]" + " {" + labelgen(
+            vertex) + "};"
+
+    yield "\\end{tikzpicture}\n\\end{center}"
+
+
+def generate_tree(treewr, *args, **kwargs):
+    """Write the tikz picture generated by tree_lines."""
+    write_lines(treewr, tree_lines(*args, **kwargs))
+
+
+def render_tex(session, contraction, tex_name, only_picture=False, workers=1, split_pages=False, categories=None,
+               color_mode="majority", profiler=None):
+    """
+    Write the tex file with the contracted tree and, unless only_picture, a page with the full subtree of every
+    drawn leaf linked from the tree. With split_pages the subtree pages become documents of their own, see
+    write_page_document. Pages are generated by workers processes, the output does not depend on their number.
+    With categories (CategoryCounts), drawn leaves are filled by the majority category of their leaves or, in the
+    proportional color_mode, by a bar per category.
+    """
+    profiler = profiler or Profiler(enabled=False)
+    tree, aggregates = session.tree, session.aggregates
+    nodes, leaves = session.view(contraction)
+    colors = () if categories is None else categories.colors
+
+    def leaf_fill(vertex, plain="fill=black"):
+        if categories is None:
+            return plain
+        shares = categories.shares(vertex)
+        if color_mode == "proportional" and len(shares) > 1:
+            return proportional_fill(shares)
+        majority = categories.majority(vertex)
+        return plain if majority is None else f"fill=category{majority}"
+
+    with open_output(tex_name) as treewr:
+        # preambule
+        print_preabmle(treewr, title, only_picture, packages=["pdfpages"] if split_pages else [], colors=colors)
+        # pdfpages names the included pages <linkname>.<page number>
+        link_suffix = ".1" if split_pages else ""
+
+        def style_generator(vertex):
+            if not contraction.is_drawn_leaf(vertex):
+                confidence = tree.get_confidence(vertex)
+                if (confidence is None) or (confidence < low_conf):
+                    return f"draw=black,ultra thin,fill,rectangle,text width=0.1mm,inner sep=0pt"
+                for thr, col in confidence_colors:
+                    if confidence >= thr:
+                        return f"draw=black, ultra thin, circle, fill={col}, minimum width=2mm, inner sep=0pt"
+
+            return f"{leaf_fill(vertex)}, rectangle, minimum height=0.55cm, text width=0.5mm, font={{\\tiny}}, " \
+                   f"inner sep=0pt, hyperlink node=subtree{vertex}{link_suffix}"
+
+        def label_generator(vertex):
+            if not contraction.is_drawn_leaf(vertex):
+                return ""
+            if not contraction.flags[vertex]:
+                return "1"
+            subtree_size = aggregates.leaf_count[vertex]
+            return f"{subtree_size}"
+
+        def style_generator_small(vertex):
+            if not contraction.is_drawn_leaf(vertex):
+                confidence = tree.get_confidence(vertex)
+                if (confidence is None) or (confidence < low_conf):
+                    return f"draw=black,ultra thin,fill,rectangle,text width=0.1mm,inner sep=0pt"
+                for thr, col in confidence_colors:
+                    if confidence >= thr:
+                        return f"draw=black, ultra thin, circle, fill={col}, minimum width=2mm, inner sep=0pt"
+
+            return f"draw=black, {leaf_fill(vertex, 'fill')}, rectangle, minimum height=1cm, text width=0.5mm, " \
+                   f"inner sep=0pt"
+
+        def style_generator_subtree(vertex):
+            if tree.out_degree(vertex) > 0:
+                confidence = tree.get_confidence(vertex)
+                if (confidence is None) or (confidence < low_conf):
+                    return f"draw=black,ultra thin,fill,rectangle,text width=0.5mm,inner sep=0pt"
+                for thr, col in confidence_colors:
+                    if confidence >= thr:
+                        return f"draw=black, ultra thin, circle, fill={col}, minimum width=1mm,inner sep=0pt"
+            else:
+                return f"draw=black,ultra thin,rectangle,{leaf_fill(vertex)},anchor=west,text width=1mm,inner sep=0pt"
+
+        # Colapsed overall tree -- generate tikz file
+        with profiler.stage("main_picture"):
+            generate_tree(treewr, tree, nodes, leaves, LR=True,
+                          nodestyle=style_generator,
+                          labelgen=label_generator,
+                          heightstep=7,
+                          paperwidth=180,  # 270
+                          ranks=session.ranks(contraction))
+
+        # Subtrees
+        if not only_picture:
+            contracted = nodes[leaves].tolist()
+            # the whole tree is laid out once, every subtree page slices its part of it
+            all_nodes, all_leaves = session.view(session.entire_tree)
+            global_ranks = session.global_ranks
+
+            def subtree_page(contr_node):
+                pagewr = io.StringIO()
+                print("\\newpage", file=pagewr)
+                print("\\hypertarget{subtree" + str(contr_node) + "}{\\section{Subtree details}}", file=pagewr)
+                print("Click the node in the detailed tree to get to the details of the molecule.", file=pagewr)
+                print("\\hspace*{-0.8cm}", file=pagewr)
+
+                # node img in the contracted graph
+                generate_tree(pagewr, tree, *contraction.view(contr_node),
+                              LR=True,
+                              nodestyle=style_generator_small,
+                              labelgen=label_generator,
+                              widthstep=30,
+                              heightstep=7.5, paperwidth=50)
+
+                # entire subtree picture
+                w = 1.1
+
+                def moved_labels_subtree(vertex, x, y, order, maxorder):
+                    if tree.out_degree(vertex) > 0:
+                        return ""
+                    name = tree.name(vertex).replace("_", " ")  # cant use _ in texfile
+
+                    name = f"\\tiny {name}"
+
+                    if (order % 2) == 0:
+                        result = f"\\node ({vertex}movedlabel) [anchor=west,minimum size=4mm,inner sep=0pt, " \
+                                 f"] at ({x + 55}mm,{y}mm) " + "{" + name + "};\n"
+                        result += f"\\draw [thin] ({vertex}) -- ({vertex}movedlabel);"
+                    else:
+                        result = f"\\node({vertex}movedlabel) [anchor=west,minimum size=4mm,inner sep=0pt] at ({x + 3}mm,{y}mm) " + "{" + name + "};"
+
+                    return result
+
+                subtree_end = tree.subtree_end[contr_node]
+                generate_tree(pagewr, tree, all_nodes[contr_node:subtree_end], all_leaves[contr_node:subtree_end],
+                              LR=True,
+                              nodestyle=style_generator_subtree,
+                              anchor="west",
+                              special_features=moved_labels_subtree,
+                              widthstep=w,
+                              heightstep=3,
+                              ranks=subtree_ranks(global_ranks, tree, contr_node))
+
+                # here, an exhaustive table can be defined
+                return pagewr.getvalue()
+
+            with profiler.stage("subtree_pages"):
+                pages = fork_map(subtree_page, contracted, workers)
+                if not split_pages:
+                    for page in pages:
+                        treewr.write(page)
+                else:
+                    pages_dir = f"{os.path.splitext(tex_name)[0]}_pages"
+                    os.makedirs(pages_dir, exist_ok=True)
+                    preamble = io.StringIO()
+                    print_preabmle(preamble, title, only_picture, title_page=False, colors=colors)
+                    page_names = set()
+                    for contr_node, page in zip(contracted, pages):
+                        document = preamble.getvalue() + page + "\\end{document}\n"
+                        page_name = write_page_document(document, pages_dir)
+                        page_names.add(page_name)
+                        relative = os.path.relpath(os.path.join(pages_dir, page_name),
+                                                   os.path.dirname(os.path.abspath(tex_name)))
+                        print(f"\\includepdf[pages=-,link,linkname=subtree{contr_node}]" + "{" + relative + ".pdf}",
+                              file=treewr)
+                    # pages of earlier contractions are not linked any more
+                    prune_pages(pages_dir, page_names)
+            profiler.tree_stats["subtree_pages"] = len(contracted)
+
+        print("\\end{document}", file=treewr)
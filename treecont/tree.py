@@ -0,0 +1,156 @@
+from functools import cached_property
+
+import numpy as np
+
+# every per-node array of a tree, in the order they are stored in the cache
+array_fields = ("parent", "child_offsets", "children", "subtree_end", "depth", "branch_length", "confidence",
+                "name_offsets")
+
+
+class Tree:
+    """
+    Rooted tree stored as flat arrays.
+
+    Nodes are numbered in preorder (the root is 0 and every node has a bigger id than its parent), which is the
+    same numbering the drawing scripts always used for node labels, and the subtree of v is the id range
+    [v, subtree_end[v]). Children of node v are children[child_offsets[v]:child_offsets[v + 1]], in the order given
+    by the input file. Missing branch lengths and confidences are stored as NaN, names are utf-8 encoded in one
+    bytes-like buffer indexed by name_offsets.
+    """
+
+    def __init__(self, parent, branch_length, confidence, name_offsets, name_data):
+        self.parent = np.asarray(parent, dtype=np.int32)
+        self.branch_length = np.asarray(branch_length, dtype=np.float64)
+        self.confidence = np.asarray(confidence, dtype=np.float64)
+        self.name_offsets = np.asarray(name_offsets, dtype=np.int64)
+        self.name_data = name_data
+
+        n = len(self.parent)
+        if n == 0 or self.parent[0] != -1 or np.any(self.parent[1:] >= np.arange(1, n)):
+            raise ValueError("Tree nodes have to be numbered in preorder.")
+
+        # children in CSR layout, stable sort keeps the original order of siblings
+        counts = np.bincount(self.parent[1:], minlength=n)
+        self.child_offsets = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(counts, out=self.child_offsets[1:])
+        self.children = (np.argsort(self.parent[1:], kind="stable") + 1).astype(np.int32)
+
+        self.depth = self._compute_depth()
+        self.subtree_end = self._compute_subtree_end()
+
+    def _compute_depth(self):
+        # pointer jumping: every round adds the depth of the ancestor pointed to and doubles the jump
+        depth = (self.parent >= 0).astype(np.int32)
+        up = self.parent.copy()
+        active = np.flatnonzero(up > 0)
+        while len(active) > 0:
+            target = up[active]
+            depth[active] += depth[target]
+            up[active] = up[target]
+            active = active[up[active] > 0]
+        return depth
+
+    def _compute_subtree_end(self):
+        # a subtree ends where the next sibling starts, the subtree of a last child ends with its parent's subtree
+        n = len(self.parent)
+        end = np.full(n, -1, dtype=np.int64)
+        end[0] = n
+        siblings = self.parent[self.children[:-1]] == self.parent[self.children[1:]]
+        end[self.children[:-1][siblings]] = self.children[1:][siblings]
+
+        up = self.parent.copy()
+        pending = np.flatnonzero(end < 0)
+        while len(pending) > 0:
+            target = up[pending]
+            resolved = end[target] >= 0
+            end[pending[resolved]] = end[target[resolved]]
+            up[pending[~resolved]] = up[target[~resolved]]
+            pending = pending[~resolved]
+        return end.astype(np.int32)
+
+    @classmethod
+    def from_lists(cls, parent, branch_length, confidence, names):
+        """Build the tree from per-node python lists, names are strings or None."""
+        encoded = [b"" if name is None else name.encode("utf-8") for name in names]
+        name_offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(x) for x in encoded], out=name_offsets[1:])
+        return cls(parent, branch_length, confidence, name_offsets, b"".join(encoded))
+
+    @classmethod
+    def from_arrays(cls, arrays, name_data):
+        """Wrap already computed arrays (e.g. memory mapped from the cache) without copying or checking them."""
+        tree = cls.__new__(cls)
+        for field in array_fields:
+            setattr(tree, field, arrays[field])
+        tree.name_data = name_data
+        return tree
+
+    def __len__(self):
+        return len(self.parent)
+
+    @property
+    def nbytes(self):
+        return sum(getattr(self, field).nbytes for field in array_fields) + len(self.name_data)
+
+    @cached_property
+    def is_leaf(self):
+        return self.child_offsets[1:] == self.child_offsets[:-1]
+
+    @cached_property
+    def root_distance(self):
+        """Sum of the branch lengths on the path from the root, missing lengths count as 0."""
+        length = np.nan_to_num(self.branch_length)
+        length[0] = 0.0
+        # every length is added over the preorder range of its subtree, cumsum then adds up the ancestors
+        change = np.append(length, 0.0) - np.bincount(self.subtree_end, weights=length, minlength=len(self) + 1)
+        return np.cumsum(change[:-1])
+
+    def collapse(self, removed):
+        """
+        Tree without the removed inner nodes (a mask or node ids, the root and leaves are never removed). Children
+        of a removed node hang from its nearest kept ancestor, extended by the removed branches, so a removed
+        binary node becomes part of a polytomy. Kept nodes are renumbered in the same order.
+        """
+        n = len(self)
+        mask = np.zeros(n, dtype=bool)
+        mask[removed] = True
+        kept = ~mask | self.is_leaf
+        kept[0] = True
+
+        # nearest kept ancestor or self by pointer jumping, every step doubles the skipped chains
+        up = np.where(kept, np.arange(n, dtype=np.int32), self.parent)
+        while True:
+            jumped = up[up]
+            if np.array_equal(jumped, up):
+                break
+            up = jumped
+
+        old_ids = np.flatnonzero(kept)
+        new_ids = np.cumsum(kept) - 1
+        anchor = up[self.parent[old_ids[1:]]]
+        parent = np.append(-1, new_ids[anchor])
+        branch_length = self.branch_length[old_ids].copy()
+        moved = anchor != self.parent[old_ids[1:]]
+        branch_length[1:][moved] = self.root_distance[old_ids[1:][moved]] - self.root_distance[anchor[moved]]
+
+        name_lengths = np.diff(self.name_offsets)
+        name_offsets = np.zeros(len(old_ids) + 1, dtype=np.int64)
+        np.cumsum(name_lengths[kept], out=name_offsets[1:])
+        name_data = np.frombuffer(self.name_data, dtype=np.uint8)[np.repeat(kept, name_lengths)].tobytes()
+        return Tree(parent, branch_length, self.confidence[old_ids], name_offsets, name_data)
+
+    def children_of(self, node):
+        return self.children[self.child_offsets[node]:self.child_offsets[node + 1]]
+
+    def out_degree(self, node):
+        return int(self.child_offsets[node + 1] - self.child_offsets[node])
+
+    def name(self, node):
+        start, end = self.name_offsets[node], self.name_offsets[node + 1]
+        if start == end:
+            return None
+        return str(self.name_data[start:end], "utf-8")
+
+    def get_confidence(self, node):
+        value = self.confidence[node]
+        return None if np.isnan(value) else float(value)
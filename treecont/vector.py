@@ -0,0 +1,407 @@
+import zlib
+from xml.sax.saxutils import escape, quoteattr
+
+import numpy as np
+
+from treecont import tikz
+from treecont.emit import buffer_size
+from treecont.layout import layout, subtree_ranks
+
+pt = 25.4 / 72  # mm
+
+xcolors = {
+    "black": (0, 0, 0),
+    "white": (1, 1, 1),
+    "grey": (0.5, 0.5, 0.5),
+    "gray": (0.5, 0.5, 0.5),
+    "red": (1, 0, 0),
+    "green": (0, 1, 0),
+    "blue": (0, 0, 1),
+}
+
+
+def xcolor_rgb(spec):
+    """Turn an xcolor expression like black!50 (50 % black, the rest white) into rgb components."""
+    name, _, percent = spec.partition("!")
+    rgb = xcolors[name]
+    if percent:
+        share = float(percent) / 100
+        rgb = tuple(share * c + (1 - share) for c in rgb)
+    return rgb
+
+
+def color_rgb(spec):
+    """Components of a #rrggbb color or of an xcolor expression."""
+    if spec.startswith("#") and len(spec) == 7:
+        return tuple(int(spec[i:i + 2], 16) / 255 for i in (1, 3, 5))
+    try:
+        return xcolor_rgb(spec)
+    except (KeyError, ValueError):
+        raise ValueError(f"Unknown color {spec}, use #rrggbb or one of {', '.join(xcolors)}.") from None
+
+
+def svg_color(rgb):
+    return "#" + "".join(f"{round(c * 255):02x}" for c in rgb)
+
+
+class SvgCanvas:
+    """Streams the drawing into one svg file, pages are placed below each other. Coordinates are in mm, y goes down."""
+
+    def __init__(self, writer, width, height):
+        self.writer = writer
+        self.top = 0
+        writer.write(f'<svg xmlns="http://www.w3.org/2000/svg" xmlns:xlink="http://www.w3.org/1999/xlink" '
+                     f'width="{width:.2f}mm" height="{height:.2f}mm" viewBox="0 0 {width:.2f} {height:.2f}" '
+                     f'font-family="Helvetica, Arial, sans-serif">\n')
+
+    def begin_page(self, height, target=None):
+        anchor = "" if target is None else f' id="{target}"'
+        self.writer.write(f'<g{anchor} transform="translate(0,{self.top:.2f})">\n')
+        self.top += height
+
+    def end_page(self):
+        self.writer.write("</g>\n")
+
+    def close(self):
+        self.writer.write("</svg>\n")
+
+    def line(self, points, width, rgb=(0, 0, 0)):
+        path = " ".join(f"{x:.3f},{y:.3f}" for x, y in points)
+        self.writer.write(f'<polyline points="{path}" fill="none" stroke="{svg_color(rgb)}" '
+                          f'stroke-width="{width:.3f}"/>\n')
+
+    def rect(self, x, y, width, height, fill=(0, 0, 0)):
+        self.writer.write(f'<rect x="{x:.3f}" y="{y:.3f}" width="{width:.3f}" height="{height:.3f}" '
+                          f'fill="{svg_color(fill)}"/>\n')
+
+    def circle(self, x, y, radius, fill, stroke_width):
+        self.writer.write(f'<circle cx="{x:.3f}" cy="{y:.3f}" r="{radius:.3f}" fill="{svg_color(fill)}" '
+                          f'stroke="black" stroke-width="{stroke_width:.3f}"/>\n')
+
+    def text(self, x, y, text, size, anchor="start"):
+        self.writer.write(f'<text x="{x:.3f}" y="{y:.3f}" font-size="{size * pt:.3f}" text-anchor="{anchor}">'
+                          f'{escape(text)}</text>\n')
+
+    def link(self, x, y, width, height, target):
+        self.writer.write(f'<a xlink:href={quoteattr("#" + target)}><rect x="{x:.3f}" y="{y:.3f}" '
+                          f'width="{width:.3f}" height="{height:.3f}" fill-opacity="0"/></a>\n')
+
+
+class PdfCanvas:
+    """
+    Streams the drawing into a pdf file with one pdf page per page, coordinates are in mm with y going down.
+
+    Object numbers of the pages are fixed up front, so links can point to pages that are not written yet. Page
+    contents are compressed while they are written and their lengths are stored as separate objects afterwards.
+    """
+
+    def __init__(self, writer, page_count):
+        self.writer = writer
+        self.offsets = {}
+        self.page_objects = [4 + 3 * i for i in range(page_count)]  # page, content, content length
+        self.targets = {}
+        self.page = 0
+        self.position = 0
+        self.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+
+    def write(self, data):
+        self.writer.write(data)
+        self.position += len(data)
+
+    def begin_object(self, number):
+        self.offsets[number] = self.position
+        self.write(f"{number} 0 obj\n".encode("latin-1"))
+
+    def target_page(self, target):
+        # pages with a target are numbered in the order they are announced
+        if target not in self.targets:
+            raise KeyError(f"Unknown link target {target}.")
+        return self.page_objects[self.targets[target]]
+
+    def announce(self, targets):
+        """Register link targets of all pages in their order, the first announced page is the next one."""
+        for i, target in enumerate(targets):
+            if target is not None:
+                self.targets[target] = self.page + i
+
+    def begin_page(self, height, target=None, width=210):
+        self.height = height
+        self.width = width
+        self.links = []
+        self.compressor = zlib.compressobj()
+        self.stream_length = 0
+        number = self.page_objects[self.page]
+        self.begin_object(number + 1)
+        self.write(f"<< /Length {number + 2} 0 R /Filter /FlateDecode >>\nstream\n".encode("latin-1"))
+
+    def draw(self, command):
+        data = self.compressor.compress((command + "\n").encode("latin-1", "replace"))
+        self.stream_length += len(data)
+        self.write(data)
+
+    def end_page(self):
+        data = self.compressor.flush()
+        self.stream_length += len(data)
+        self.write(data)
+        self.write(b"\nendstream\nendobj\n")
+
+        number = self.page_objects[self.page]
+        self.begin_object(number + 2)
+        self.write(f"{self.stream_length}\nendobj\n".encode("latin-1"))
+
+        annotations = " ".join(
+            f"<< /Type /Annot /Subtype /Link /Border [0 0 0] /Rect [{x0:.2f} {y0:.2f} {x1:.2f} {y1:.2f}] "
+            f"/Dest [{self.target_page(target)} 0 R /XYZ null null null] >>"
+            for x0, y0, x1, y1, target in self.links)
+        self.begin_object(number)
+        self.write(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {self.width / pt:.2f} {self.height / pt:.2f}] "
+                   f"/Resources << /Font << /F1 3 0 R >> >> /Contents {number + 1} 0 R "
+                   f"/Annots [{annotations}] >>\nendobj\n".encode("latin-1"))
+        self.page += 1
+
+    def close(self):
+        self.begin_object(1)
+        self.write(b"<< /Type /Catalog /Pages 2 0 R >>\nendobj\n")
+        self.begin_object(2)
+        kids = " ".join(f"{number} 0 R" for number in self.page_objects)
+        self.write(f"<< /Type /Pages /Kids [{kids}] /Count {len(self.page_objects)} >>\nendobj\n".encode("latin-1"))
+        self.begin_object(3)
+        self.write(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>\nendobj\n")
+
+        xref = self.position
+        count = max(self.offsets) + 1
+        self.write(f"xref\n0 {count}\n0000000000 65535 f \n".encode("latin-1"))
+        for number in range(1, count):
+            self.write(f"{self.offsets[number]:010d} 00000 n \n".encode("latin-1"))
+        self.write(f"trailer\n<< /Size {count} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode("latin-1"))
+
+    def point(self, x, y):
+        return x / pt, (self.height - y) / pt
+
+    def line(self, points, width, rgb=(0, 0, 0)):
+        path = [f"{px:.2f} {py:.2f}" for px, py in (self.point(x, y) for x, y in points)]
+        self.draw(f"{width / pt:.3f} w {rgb[0]:.3f} {rgb[1]:.3f} {rgb[2]:.3f} RG {path[0]} m "
+                  + " ".join(f"{p} l" for p in path[1:]) + " S")
+
+    def rect(self, x, y, width, height, fill=(0, 0, 0)):
+        px, py = self.point(x, y + height)
+        self.draw(f"{fill[0]:.3f} {fill[1]:.3f} {fill[2]:.3f} rg {px:.2f} {py:.2f} {width / pt:.2f} "
+                  f"{height / pt:.2f} re f")
+
+    def circle(self, x, y, radius, fill, stroke_width):
+        # four bezier arcs
+        cx, cy = self.point(x, y)
+        r = radius / pt
+        k = 0.5523 * r
+        self.draw(f"{stroke_width / pt:.3f} w 0 0 0 RG {fill[0]:.3f} {fill[1]:.3f} {fill[2]:.3f} rg "
+                  f"{cx + r:.2f} {cy:.2f} m "
+                  f"{cx + r:.2f} {cy + k:.2f} {cx + k:.2f} {cy + r:.2f} {cx:.2f} {cy + r:.2f} c "
+                  f"{cx - k:.2f} {cy + r:.2f} {cx - r:.2f} {cy + k:.2f} {cx - r:.2f} {cy:.2f} c "
+                  f"{cx - r:.2f} {cy - k:.2f} {cx - k:.2f} {cy - r:.2f} {cx:.2f} {cy - r:.2f} c "
+                  f"{cx + k:.2f} {cy - r:.2f} {cx + r:.2f} {cy - k:.2f} {cx + r:.2f} {cy:.2f} c B")
+
+    def text(self, x, y, text, size, anchor="start"):
+        if anchor != "start":  # helvetica is about half an em wide per character
+            shift = 0.55 * size * pt * len(text)
+            x -= shift if anchor == "end" else shift / 2
+        px, py = self.point(x, y)
+        escaped = text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+        self.draw(f"0 0 0 rg BT /F1 {size} Tf {px:.2f} {py:.2f} Td ({escaped}) Tj ET")
+
+    def link(self, x, y, width, height, target):
+        x0, y1 = self.point(x, y)
+        x1, y0 = self.point(x + width, y + height)
+        self.links.append((x0, y0, x1, y1, target))
+
+
+class PictureStyle:
+    """Sizes of one kind of tree picture, all lengths in mm."""
+
+    def __init__(self, heightstep, widthstep=None, paperwidth=180, leaf_width=0.5, leaf_height=5.5,
+                 circle_radius=1.0, edge_width=1.2 * pt, font_size=5):
+        self.heightstep = heightstep
+        self.widthstep = widthstep
+        self.paperwidth = paperwidth
+        self.leaf_width = leaf_width
+        self.leaf_height = leaf_height
+        self.circle_radius = circle_radius
+        self.edge_width = edge_width
+        self.font_size = font_size
+
+
+class Picture:
+    """Tree picture laid out left to right like the TikZ pictures, with y going down the page."""
+
+    def __init__(self, tree, nodes, leaves, style, ranks=None):
+        self.tree, self.nodes, self.leaves, self.style = tree, nodes, leaves, style
+        if ranks is None:
+            ranks = layout(tree, nodes, leaves)
+        widthstep = style.widthstep
+        if widthstep is None:
+            widthstep = style.paperwidth / max(ranks[:, 1].max(), 1)
+        self.x = ranks[:, 0] * style.heightstep + style.heightstep  # room for the root stub
+        self.y = (ranks[:, 1].max() - ranks[:, 1]) * widthstep
+        self.order = ranks[:, 1]
+        self.parents = np.searchsorted(nodes, tree.parent[nodes[1:]])
+
+    @property
+    def width(self):
+        return float(self.x.max())
+
+    @property
+    def height(self):
+        return float(self.y.max()) + self.style.leaf_height
+
+    def draw(self, canvas, left, top, node_fill, label=None, link=None, leaf_text=None, leaf_fill=None):
+        """
+        Draw the picture with its top left corner at (left, top).
+
+        node_fill(vertex) gives the fill of an inner node or None for a tiny square, label(vertex) the text left of
+        a node, link(vertex) the link target of a leaf and leaf_text(vertex, order) the text right of a leaf.
+        leaf_fill(vertex) gives the (rgb, share) bars filling a leaf bottom up, black if not given.
+        """
+        style = self.style
+        nodes, xs, ys = self.nodes.tolist(), (self.x + left).tolist(), (self.y + top + style.leaf_height / 2).tolist()
+
+        canvas.line([(xs[0] - style.heightstep, ys[0]), (xs[0], ys[0])], style.edge_width)
+        for i, p in enumerate(self.parents.tolist(), start=1):
+            canvas.line([(xs[p], ys[p]), (xs[p], ys[i]), (xs[i], ys[i])], style.edge_width)
+
+        for i, (vertex, leaf) in enumerate(zip(nodes, self.leaves.tolist())):
+            x, y = xs[i], ys[i]
+            if leaf:
+                if leaf_fill is None:
+                    canvas.rect(x - style.leaf_width / 2, y - style.leaf_height / 2, style.leaf_width,
+                                style.leaf_height)
+                else:
+                    bottom = y + style.leaf_height / 2
+                    for rgb, share in leaf_fill(vertex):
+                        canvas.rect(x - style.leaf_width / 2, bottom - share * style.leaf_height, style.leaf_width,
+                                    share * style.leaf_height, rgb)
+                        bottom -= share * style.leaf_height
+                target = None if link is None else link(vertex)
+                if target is not None:
+                    canvas.link(x - style.leaf_height / 2, y - style.leaf_height / 2, style.leaf_height,
+                                style.leaf_height, target)
+                if leaf_text is not None:
+                    leaf_text(canvas, vertex, x, y, self.order[i])
+            else:
+                fill = node_fill(vertex)
+                if fill is None:
+                    canvas.rect(x - 0.15, y - 0.15, 0.3, 0.3)
+                else:
+                    canvas.circle(x, y, style.circle_radius, fill, 0.1)
+
+            text = "" if label is None else label(vertex)
+            if text:
+                canvas.text(x - style.leaf_width, y, text, style.font_size, anchor="end")
+
+
+main_style = PictureStyle(heightstep=7, paperwidth=180)
+small_style = PictureStyle(heightstep=7.5, widthstep=30, leaf_height=10)
+subtree_style = PictureStyle(heightstep=3, widthstep=1.1, leaf_width=1, leaf_height=0.5, circle_radius=0.5)
+
+margin = 10
+label_space = 70  # room for the moved leaf labels right of a subtree
+
+
+def write_pages(path, backend, session, contraction, title=tikz.title, only_picture=False,
+                confidence_colors=tikz.confidence_colors, low_conf=tikz.low_conf, categories=None,
+                color_mode="majority"):
+    """
+    Write the same pages as the TikZ output, a title page, the contracted tree and a page for every drawn leaf with
+    its full subtree, as svg or pdf without any external tool. Drawn leaves of the contracted tree link to their
+    subtree pages. contraction must come from the tree session. Leaves are colored by categories like in
+    render_tex.
+    """
+    tree, aggregates = session.tree, session.aggregates
+    rgbs = None if categories is None else [color_rgb(color) for color in categories.colors]
+
+    def category_fill(vertex):
+        if color_mode == "proportional":
+            return [(rgbs[c], share) for c, share in categories.shares(vertex)]
+        majority = categories.majority(vertex)
+        return [((0, 0, 0) if majority is None else rgbs[majority], 1.0)]
+
+    leaf_fill = None if categories is None else category_fill
+
+    def node_fill(vertex):
+        confidence = tree.get_confidence(vertex)
+        if confidence is None or confidence < low_conf:
+            return None
+        for thr, col in confidence_colors:
+            if confidence >= thr:
+                return xcolor_rgb(col)
+        return None
+
+    def count_label(vertex):
+        if not contraction.is_drawn_leaf(vertex):
+            return ""
+        return str(aggregates.leaf_count[vertex])
+
+    def subtree_link(vertex):
+        return None if only_picture else f"subtree{vertex}"
+
+    def moved_label(canvas, vertex, x, y, order):
+        name = tree.name(vertex) or ""
+        if order % 2 == 0:
+            canvas.line([(x, y), (x + 55, y)], 0.2)
+            canvas.text(x + 55, y + 0.6, name, 5)
+        else:
+            canvas.text(x + 3, y + 0.6, name, 5)
+
+    nodes, leaves = session.view(contraction)
+    main = Picture(tree, nodes, leaves, main_style, ranks=session.ranks(contraction))
+    pages_of = [] if only_picture else nodes[leaves].tolist()
+
+    # sizes of all pages are needed up front, the svg header holds the total height
+    pictures = []
+    if pages_of:
+        all_nodes, all_leaves = session.view(session.entire_tree)
+        global_ranks = session.global_ranks
+    for vertex in pages_of:
+        end = tree.subtree_end[vertex]
+        small = Picture(tree, *contraction.view(vertex), small_style)
+        subtree = Picture(tree, all_nodes[vertex:end], all_leaves[vertex:end], subtree_style,
+                          ranks=subtree_ranks(global_ranks, tree, vertex))
+        pictures.append((vertex, small, subtree))
+    page_width = max([main.width + 2 * margin, 210] + [s.width + label_space + 2 * margin for _, _, s in pictures])
+    heights = ([] if only_picture else [297]) + [main.height + 2 * margin]
+    heights += [small.height + subtree.height + 4 * margin for _, small, subtree in pictures]
+
+    with open(path, mode='w' if backend == "svg" else 'wb', buffering=buffer_size) as writer:
+        if backend == "svg":
+            canvas = SvgCanvas(writer, page_width, sum(heights))
+        else:
+            canvas = PdfCanvas(writer, len(heights))
+            canvas.announce(([] if only_picture else [None]) + [None] + [f"subtree{v}" for v in pages_of])
+        page_heights = iter(heights)
+
+        def begin_page(target=None):
+            height = next(page_heights)
+            if backend == "svg":
+                canvas.begin_page(height, target)
+            else:
+                canvas.begin_page(height, target, width=page_width)
+
+        if not only_picture:
+            begin_page()
+            canvas.text(page_width / 2, 100, title, 14.4, anchor="middle")
+            canvas.text(page_width / 2, 110, "Click the taxon to get to the subtree details.", 10, anchor="middle")
+            canvas.end_page()
+
+        begin_page()
+        main.draw(canvas, margin, margin, node_fill, label=count_label, link=subtree_link, leaf_fill=leaf_fill)
+        canvas.end_page()
+
+        for vertex, small, subtree in pictures:
+            begin_page(f"subtree{vertex}")
+            canvas.text(margin, margin, "Subtree details", 14.4)
+            canvas.text(margin, margin + 6, "Click the node in the detailed tree to get to the details of the "
+                                            "molecule.", 10)
+            small.draw(canvas, margin, 2 * margin, node_fill, label=count_label, leaf_fill=leaf_fill)
+            subtree.draw(canvas, margin, 3 * margin + small.height, node_fill, leaf_text=moved_label,
+                         leaf_fill=leaf_fill)
+            canvas.end_page()
+
+        canvas.close()